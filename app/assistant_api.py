@@ -1,12 +1,16 @@
 import os
-from openai import OpenAI
+import threading
 from typing import List, Dict, Any, Optional
+from app.circuit_breaker import admit
+from app.openai_client import client, VECTOR_STORE_ID
+from app.deadline import check, remaining, no_deadline, DeadlineExceeded
+from app.file_lock import file_lock
 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-VECTOR_STORE_ID = os.getenv("VECTOR_STORE_ID")
-ASSISTANT_ID_PATH = os.path.join(os.path.dirname(__file__), "assistant_id.txt")
+ASSISTANT_ID_PATH = os.getenv("ASSISTANT_ID_PATH", os.path.join(os.path.dirname(__file__), "assistant_id.txt"))
 
-client = OpenAI(api_key=OPENAI_API_KEY)
+# Cached per process after the first lookup; guarded by a file lock across processes
+_assistant_id: Optional[str] = None
+_assistant_lock = threading.Lock()
 
 # Function tool schemas
 weather_tool_schema = {
@@ -25,6 +29,25 @@ weather_tool_schema = {
         }
     }
 }
+weather_batch_tool_schema = {
+    "type": "function",
+    "function": {
+        "name": "get_weather_batch",
+        "description": "Get current weather for several locations in one call.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "locations": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "description": "Locations as 'City,CC' strings or OpenWeatherMap city IDs"
+                },
+                "units": {"type": "string", "enum": ["metric", "imperial"], "default": "metric"}
+            },
+            "required": ["locations"]
+        }
+    }
+}
 llm_tool_schema = {
     "type": "function",
     "function": {
@@ -34,7 +57,7 @@ llm_tool_schema = {
             "type": "object",
             "properties": {
                 "prompt": {"type": "string"},
-                "model": {"type": "string", "default": "openai/gpt-4.1-nano"},
+                "model": {"type": "string", "description": "Optional model override; omit to let the router choose"},
                 "max_tokens": {"type": "integer", "default": 1000},
                 "temperature": {"type": "number", "default": 0.7}
             },
@@ -48,30 +71,60 @@ def get_or_create_assistant(name="Memir Assistant", instructions="You are a help
     """
     Create or retrieve an Assistant with file_search and function tools.
     Persist the assistant_id for reuse.
+    Safe across worker processes: creation happens under an exclusive file lock and
+    the id file is written atomically, so concurrent boots create exactly one Assistant.
     """
+    global _assistant_id
+    if _assistant_id:
+        return _assistant_id
+    with _assistant_lock, file_lock(ASSISTANT_ID_PATH + ".lock"):
+        if _assistant_id:
+            return _assistant_id
+        existing = _read_assistant_id()
+        if existing:
+            _assistant_id = existing
+            return existing
+        _assistant_id = _create_assistant(name, instructions, model, vector_store_id)
+        return _assistant_id
+
+
+def _read_assistant_id() -> Optional[str]:
     if os.path.exists(ASSISTANT_ID_PATH):
         with open(ASSISTANT_ID_PATH, "r") as f:
-            return f.read().strip()
+            return f.read().strip() or None
+    return None
+
+
+def _create_assistant(name: str, instructions: str, model: str, vector_store_id: Optional[str]) -> str:
     tools = [
         {"type": "file_search", "vector_store_ids": [vector_store_id or VECTOR_STORE_ID]},
         weather_tool_schema,
+        weather_batch_tool_schema,
         llm_tool_schema
     ]
+    admit("openai")
     assistant = client.beta.assistants.create(
         name=name,
         instructions=instructions,
         model=model,
         tools=tools
     )
-    with open(ASSISTANT_ID_PATH, "w") as f:
+    # Write then rename, so readers never see a half-written id
+    tmp_path = f"{ASSISTANT_ID_PATH}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
         f.write(assistant.id)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, ASSISTANT_ID_PATH)
     return assistant.id
 
 def create_thread(messages: Optional[List[Dict[str, Any]]] = None) -> str:
+    admit("openai")
     thread = client.beta.threads.create(messages=messages or [])
     return thread.id
 
 def add_message(thread_id: str, role: str, content: Any, attachments: Optional[List[Dict[str, Any]]] = None) -> str:
+    admit("openai")
     msg = client.beta.threads.messages.create(
         thread_id=thread_id,
         role=role,
@@ -81,6 +134,7 @@ def add_message(thread_id: str, role: str, content: Any, attachments: Optional[L
     return msg.id
 
 def run_assistant(thread_id: str, assistant_id: str, instructions: Optional[str] = None) -> str:
+    admit("openai")
     run = client.beta.threads.runs.create(
         thread_id=thread_id,
         assistant_id=assistant_id,
@@ -92,43 +146,80 @@ def handle_tool_calls(thread_id: str, run_id: str, tool_call_handler_fn) -> dict
     """
     Handles tool calls for a run. Calls tool_call_handler_fn(tool_call) for each tool call,
     submits the outputs, and returns the final run result.
+    Polling stops at the request deadline: the run is cancelled and DeadlineExceeded raised.
     """
     import time
-    while True:
-        run = client.beta.threads.runs.retrieve(thread_id=thread_id, run_id=run_id)
-        if run.status == "requires_action":
-            tool_outputs = []
-            for tool_call in run.required_action.submit_tool_outputs.tool_calls:
-                output = tool_call_handler_fn(tool_call)
-                tool_outputs.append({
-                    "tool_call_id": tool_call.id,
-                    "output": output
-                })
-            client.beta.threads.runs.submit_tool_outputs(
-                thread_id=thread_id,
-                run_id=run_id,
-                tool_outputs=tool_outputs
-            )
-        elif run.status in ("queued", "in_progress"):
-            time.sleep(1)
-        else:
-            break
+    try:
+        while True:
+            check()
+            admit("openai")
+            run = client.beta.threads.runs.retrieve(thread_id=thread_id, run_id=run_id)
+            if run.status == "requires_action":
+                tool_outputs = []
+                for tool_call in run.required_action.submit_tool_outputs.tool_calls:
+                    output = tool_call_handler_fn(tool_call)
+                    tool_outputs.append({
+                        "tool_call_id": tool_call.id,
+                        "output": output
+                    })
+                admit("openai")
+                client.beta.threads.runs.submit_tool_outputs(
+                    thread_id=thread_id,
+                    run_id=run_id,
+                    tool_outputs=tool_outputs
+                )
+            elif run.status in ("queued", "in_progress"):
+                time.sleep(min(1.0, remaining(1.0)))
+            else:
+                break
+    except DeadlineExceeded:
+        _cancel_run(thread_id, run_id)
+        raise
     return run.to_dict()
 
+def _cancel_run(thread_id: str, run_id: str):
+    # Best effort, outside the spent deadline, so the run stops consuming tokens upstream
+    with no_deadline():
+        try:
+            client.beta.threads.runs.cancel(thread_id=thread_id, run_id=run_id, timeout=5)
+        except Exception as e:
+            print(f"Failed to cancel run {run_id}: {e}")
+
 def get_run_status(thread_id: str, run_id: str) -> Dict[str, Any]:
+    admit("openai")
     return client.beta.threads.runs.retrieve(thread_id=thread_id, run_id=run_id)
 
 def get_messages(thread_id: str) -> List[Dict[str, Any]]:
+    admit("openai")
     msgs = client.beta.threads.messages.list(thread_id=thread_id)
     return [msg.to_dict() for msg in msgs.data]
 
+def get_messages_page(thread_id: str, limit: int = 100, after: Optional[str] = None) -> Dict[str, Any]:
+    """
+    One page of a thread's messages (newest first). Pass the returned `last_id` as
+    `after` to fetch the next page while `has_more` is true.
+    """
+    admit("openai")
+    kwargs = {"after": after} if after else {}
+    page = client.beta.threads.messages.list(thread_id=thread_id, limit=limit, **kwargs)
+    messages = [msg.to_dict() for msg in page.data]
+    return {
+        "messages": messages,
+        "has_more": bool(page.has_more),
+        "last_id": messages[-1]["id"] if messages else None,
+    }
+
 def upload_memory_file(file_path: str) -> str:
-    file_obj = client.files.create(file=open(file_path, "rb"), purpose="assistants")
+    admit("openai")
+    with open(file_path, "rb") as f:
+        file_obj = client.files.create(file=f, purpose="assistants")
     # Attach to vector store
+    admit("openai")
     client.vector_stores.files.create(vector_store_id=VECTOR_STORE_ID, file_id=file_obj.id)
     return file_obj.id
 
 def list_memory_files() -> List[Dict[str, Any]]:
+    admit("openai")
     resp = client.vector_stores.files.list(vector_store_id=VECTOR_STORE_ID)
     return [
         {"id": file.id, "created_at": getattr(file, "created_at", None), "status": getattr(file, "status", None)}
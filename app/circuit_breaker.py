@@ -0,0 +1,198 @@
+"""
+Per-provider circuit breakers for upstream calls.
+
+After `failure_threshold` consecutive failures a provider's breaker opens and
+calls fail fast with CircuitOpen instead of waiting on a dependency that is down.
+After `reset_timeout` seconds one probe call is let through (half-open); success
+closes the breaker, failure re-opens it. Client errors (4xx other than 429) are
+the caller's problem and never trip a breaker.
+
+admit() is the single gate in front of every upstream call: it checks the
+request deadline, the breaker and the rate limiter, in that order.
+
+Usage Example:
+    admit("openrouter")
+    try:
+        resp = requests.post(url, json=data, timeout=timeout_for(60))
+        resp.raise_for_status()
+    except Exception as e:
+        record_failure("openrouter", e)
+        raise
+    record_success("openrouter")
+"""
+import os
+import time
+import threading
+from typing import Dict, Any, Optional
+
+from app.deadline import check, remaining, DeadlineExceeded
+from app.rate_limiter import acquire, RateLimitTimeout
+
+
+class CircuitOpen(Exception):
+    """The provider's breaker is open; the call was not attempted."""
+
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+        self._stats = {"rejected": 0, "opened": 0}
+
+    def before_call(self):
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    self._stats["rejected"] += 1
+                    raise CircuitOpen(f"{self.name} is unavailable (circuit open)")
+                self.state = HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == HALF_OPEN:
+                if self._probe_in_flight:
+                    self._stats["rejected"] += 1
+                    raise CircuitOpen(f"{self.name} is recovering (probe in flight)")
+                self._probe_in_flight = True
+
+    def release_probe(self):
+        """Give back a half-open probe slot for a call that was never sent."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probe_in_flight = False
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self._stats["opened"] += 1
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"state": self.state, "consecutive_failures": self.failures, **self._stats}
+
+
+def is_failure(exc: BaseException) -> bool:
+    """Whether an exception says the dependency is unhealthy (vs. a bad request)."""
+    if isinstance(exc, (CircuitOpen, DeadlineExceeded)):
+        return False
+    status = getattr(exc, "status_code", None)
+    response = getattr(exc, "response", None)
+    if status is None and response is not None:
+        status = getattr(response, "status_code", None)
+    if status is None:
+        return True
+    return status >= 500 or status == 429
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(provider: str) -> CircuitBreaker:
+    with _breakers_lock:
+        breaker = _breakers.get(provider)
+        if breaker is None:
+            prefix = f"CIRCUIT_{provider.upper()}"
+            breaker = _breakers[provider] = CircuitBreaker(
+                provider,
+                failure_threshold=int(os.getenv(f"{prefix}_FAILURES", "5")),
+                reset_timeout=float(os.getenv(f"{prefix}_RESET", "30")),
+            )
+        return breaker
+
+
+def admit(provider: str):
+    """Gate an upstream call: deadline, then circuit breaker, then rate limit."""
+    check()
+    breaker = get_breaker(provider)
+    breaker.before_call()
+    try:
+        acquire(provider, timeout=remaining())
+    except RateLimitTimeout:
+        breaker.release_probe()
+        raise DeadlineExceeded(f"Deadline passed while waiting for {provider} rate limit")
+
+
+def record_success(provider: str):
+    get_breaker(provider).record_success()
+
+
+def record_failure(provider: str, exc: Optional[BaseException] = None):
+    if remaining(1.0) <= 0:
+        # We cut the call short at the request deadline; that says nothing about the provider,
+        # but a half-open probe must still be handed back or the breaker never leaves half-open
+        get_breaker(provider).release_probe()
+        return
+    if exc is None or is_failure(exc):
+        get_breaker(provider).record_failure()
+    else:
+        # The service answered; a 4xx is not a sign it is down
+        get_breaker(provider).record_success()
+
+
+def breaker_stats() -> Dict[str, Dict[str, Any]]:
+    with _breakers_lock:
+        breakers = dict(_breakers)
+    return {name: breaker.stats() for name, breaker in breakers.items()}
+
+
+class GuardedTransport:
+    """
+    Wraps an SDK client's httpx transport (OpenAI): caps each request's timeout by
+    the current deadline and feeds responses/errors into the provider's breaker.
+    Duck-typed: it only needs handle_request/close from the inner transport.
+
+        DefaultHttpxClient(transport=GuardedTransport("openai", HTTPTransport()))
+    """
+
+    def __init__(self, provider: str, inner):
+        self.provider = provider
+        self.inner = inner
+
+    def handle_request(self, request):
+        left = remaining()
+        if left is not None:
+            # A spent deadline still goes through the transport so the SDK sees its own timeout error
+            left = max(left, 0.001)
+            timeout = request.extensions.get("timeout") or {}
+            request.extensions["timeout"] = {
+                key: left if timeout.get(key) is None else min(timeout[key], left)
+                for key in ("connect", "read", "write", "pool")
+            }
+        try:
+            response = self.inner.handle_request(request)
+        except Exception:
+            record_failure(self.provider)
+            raise
+        if response.status_code >= 500 or response.status_code == 429:
+            record_failure(self.provider)
+        else:
+            record_success(self.provider)
+        return response
+
+    def close(self):
+        self.inner.close()
+
+    def __enter__(self):
+        self.inner.__enter__()
+        return self
+
+    def __exit__(self, *args):
+        return self.inner.__exit__(*args)
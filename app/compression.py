@@ -0,0 +1,126 @@
+"""
+Response compression with gzip/brotli negotiation.
+
+Picks the best encoding the client accepts (brotli when the `brotli` package is
+installed, else gzip) and compresses responses whose body reaches `minimum_size`
+bytes. Small responses go out untouched, since compressing them costs more than
+it saves. Streaming responses are compressed chunk by chunk and flushed after each
+chunk, so streamed JSON keeps flowing instead of being held back by the encoder.
+
+Configuration (env):
+    COMPRESS_MIN_SIZE   bytes below which responses are sent uncompressed (default 1024)
+    COMPRESS_LEVEL      gzip level 1-9 (default 6); brotli uses quality 4 for speed
+"""
+import os
+import zlib
+from typing import Optional
+
+try:
+    import brotli
+except ImportError:  # optional: `pip install brotli` enables br
+    brotli = None
+
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+COMPRESS_LEVEL = int(os.getenv("COMPRESS_LEVEL", "6"))
+
+# Already-compressed media gain nothing from a second pass
+INCOMPRESSIBLE_PREFIXES = ("image/", "audio/", "video/", "application/zip", "application/gzip")
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """Pick "br" or "gzip" from an Accept-Encoding header, honouring q=0."""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            accepted[name.strip().lower()] = q
+    wildcard = accepted.get("*", 0.0)
+    for encoding in (("br", "gzip") if brotli is not None else ("gzip",)):
+        if accepted.get(encoding, wildcard) > 0:
+            return encoding
+    return None
+
+
+class _Encoder:
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._br = brotli.Compressor(quality=4)
+        else:
+            self._gz = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        if self.encoding == "br":
+            out = self._br.process(data)
+            return out + (self._br.finish() if final else self._br.flush())
+        out = self._gz.compress(data)
+        return out + self._gz.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = COMPRESS_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get("headers", []))
+        encoding = negotiate(headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        pending = bytearray()
+        encoder = None
+
+        async def send_start(compress: bool):
+            response_headers = [(k, v) for k, v in start["headers"] if k.lower() != b"content-length"]
+            if compress:
+                response_headers += [(b"content-encoding", encoding.encode()), (b"vary", b"Accept-Encoding")]
+            else:
+                response_headers = start["headers"]
+            await send({**start, "headers": response_headers})
+
+        async def wrapped_send(message):
+            nonlocal start, encoder
+            if message["type"] == "http.response.start":
+                start = message
+                response_headers = {k.lower(): v for k, v in message["headers"]}
+                content_type = response_headers.get(b"content-type", b"").decode("latin-1")
+                if b"content-encoding" in response_headers or content_type.startswith(INCOMPRESSIBLE_PREFIXES):
+                    encoder = False
+                    await send(message)
+                return
+            if message["type"] != "http.response.body" or encoder is False:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more = message.get("more_body", False)
+            if encoder is None:
+                # Hold the start message until we know whether the body is big enough to compress
+                pending.extend(body)
+                if len(pending) < self.minimum_size:
+                    if more:
+                        return
+                    encoder = False
+                    await send_start(False)
+                    await send({"type": "http.response.body", "body": bytes(pending), "more_body": False})
+                    return
+                encoder = _Encoder(encoding)
+                await send_start(True)
+                body = bytes(pending)
+                pending.clear()
+            await send({"type": "http.response.body", "body": encoder.compress(body, final=not more), "more_body": more})
+
+        await self.app(scope, receive, wrapped_send)
@@ -0,0 +1,115 @@
+"""
+Per-request deadlines that flow into every upstream call.
+
+A Deadline is set once (by the HTTP middleware, or per CLI turn) and carried in a
+context variable, so it follows the request into threadpool endpoints, tool
+handlers and hedged LLM calls without being passed around. Upstream callers ask
+timeout_for() for their socket timeout and call check() between steps; both raise
+DeadlineExceeded once the budget is spent or the request was cancelled (e.g. the
+client disconnected).
+
+Usage Example:
+    with deadline_scope(30):
+        resp = requests.get(url, timeout=timeout_for(10))
+        check()
+"""
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Optional
+
+
+class DeadlineExceeded(Exception):
+    """The request ran out of time or was cancelled."""
+
+
+class Deadline:
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+        self._cancelled = threading.Event()
+
+    def remaining(self) -> float:
+        if self._cancelled.is_set():
+            return 0.0
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def check(self):
+        if self._cancelled.is_set():
+            raise DeadlineExceeded("Request was cancelled")
+        if self.expired:
+            raise DeadlineExceeded("Request deadline exceeded")
+
+
+_current = contextvars.ContextVar("memir_deadline", default=None)
+
+
+def current_deadline() -> Optional[Deadline]:
+    return _current.get()
+
+
+def set_deadline(deadline: Deadline):
+    """Install a deadline for the current context; returns a token for reset_deadline()."""
+    return _current.set(deadline)
+
+
+def reset_deadline(token):
+    _current.reset(token)
+
+
+@contextmanager
+def deadline_scope(seconds: float):
+    """Run the block under a deadline; an enclosing, earlier deadline still wins."""
+    outer = _current.get()
+    deadline = Deadline(seconds)
+    if outer is not None:
+        deadline.expires_at = min(deadline.expires_at, outer.expires_at)
+        if outer.cancelled:
+            deadline.cancel()
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def no_deadline():
+    """Suspend the deadline for cleanup work that must run after it passed (e.g. cancelling a run)."""
+    token = _current.set(None)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def check():
+    """Raise DeadlineExceeded if the current deadline has passed (no-op without one)."""
+    deadline = _current.get()
+    if deadline is not None:
+        deadline.check()
+
+
+def remaining(default: Optional[float] = None) -> Optional[float]:
+    deadline = _current.get()
+    return default if deadline is None else deadline.remaining()
+
+
+def timeout_for(default: float) -> float:
+    """Timeout for one upstream call: `default`, capped by the time left on the deadline."""
+    deadline = _current.get()
+    if deadline is None:
+        return default
+    deadline.check()
+    return min(default, deadline.remaining())
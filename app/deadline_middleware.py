@@ -0,0 +1,81 @@
+"""
+ASGI middleware that gives every HTTP request a deadline and cancels it when the
+client goes away.
+
+The deadline is installed in the request's context before the app runs, so sync
+endpoints (run in the threadpool with a copy of the context) and everything they
+call see it. Once the request body has been read, a watcher task keeps listening
+for `http.disconnect`; if the client hangs up, the deadline is cancelled and the
+next upstream call or deadline check raises DeadlineExceeded instead of finishing
+work nobody will read.
+
+Configuration (env):
+    REQUEST_TIMEOUT      default per-request budget in seconds (default 30)
+    REQUEST_TIMEOUT_MAX  upper bound for the X-Request-Timeout header (default 120)
+"""
+import os
+import asyncio
+
+from app.deadline import Deadline, set_deadline, reset_deadline
+
+REQUEST_TIMEOUT = float(os.getenv("REQUEST_TIMEOUT", "30"))
+REQUEST_TIMEOUT_MAX = float(os.getenv("REQUEST_TIMEOUT_MAX", "120"))
+
+
+def _requested_timeout(headers) -> float:
+    value = headers.get(b"x-request-timeout")
+    if value:
+        try:
+            return max(0.1, min(float(value), REQUEST_TIMEOUT_MAX))
+        except ValueError:
+            pass
+    return REQUEST_TIMEOUT
+
+
+class DeadlineMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers", []))
+        deadline = Deadline(_requested_timeout(headers))
+        later = asyncio.Queue()
+        # Bodyless requests (most GETs) never read from receive(), so watch from the start
+        body_done = b"content-length" not in headers and b"transfer-encoding" not in headers
+        watcher = None
+
+        async def watch():
+            # After the body is read the app rarely calls receive() again; we do it for it
+            while True:
+                message = await receive()
+                if message["type"] == "http.disconnect":
+                    deadline.cancel()
+                await later.put(message)
+                if message["type"] == "http.disconnect":
+                    return
+
+        async def wrapped_receive():
+            nonlocal body_done, watcher
+            if body_done:
+                return await later.get()
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                deadline.cancel()
+            elif not message.get("more_body", False):
+                body_done = True
+                watcher = asyncio.ensure_future(watch())
+            return message
+
+        if body_done:
+            watcher = asyncio.ensure_future(watch())
+        token = set_deadline(deadline)
+        try:
+            await self.app(scope, wrapped_receive, send)
+        finally:
+            reset_deadline(token)
+            if watcher is not None:
+                watcher.cancel()
@@ -1,15 +1,22 @@
-import openai
-import os
 from typing import List
-
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+from app.circuit_breaker import admit
+from app.openai_client import client
 
 # Uses OpenAI's embedding API to get a vector for a string
 
 def get_openai_embedding(text: str, model: str = "text-embedding-3-small") -> List[float]:
-    openai.api_key = OPENAI_API_KEY
-    response = openai.embeddings.create(
+    response = client.embeddings.create(
         input=text,
         model=model
     )
     return response.data[0].embedding
+
+
+def get_openai_embeddings(texts: List[str], model: str = "text-embedding-3-small") -> List[List[float]]:
+    """Embed several strings in one request; results are in the same order as `texts`."""
+    admit("openai")
+    response = client.embeddings.create(
+        input=texts,
+        model=model
+    )
+    return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
@@ -0,0 +1,36 @@
+"""
+Exclusive inter-process locks on a lock file (POSIX flock).
+
+Where fcntl is unavailable (Windows) the lock is a no-op across processes, so
+callers still need their own in-process lock for threads.
+
+Usage Example:
+    with file_lock("/tmp/memir.lock"):
+        ...                                  # one process at a time
+    with file_lock("/tmp/memir.lock", blocking=False) as acquired:
+        if acquired:
+            ...                              # skipped if another process holds it
+"""
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+@contextmanager
+def file_lock(path: str, blocking: bool = True):
+    """Hold an exclusive lock on `path`; yields False if non-blocking and already held."""
+    with open(path, "a") as lock_file:
+        acquired = True
+        if fcntl:
+            try:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except BlockingIOError:
+                acquired = False
+        try:
+            yield acquired
+        finally:
+            if fcntl and acquired:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
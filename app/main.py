@@ -1,18 +1,82 @@
-from fastapi import FastAPI, Query, HTTPException, Body
-from typing import Optional
-from app.weather import get_weather, get_onecall_weather
-from app.openrouter_client import OpenRouterClient
+from fastapi import FastAPI, Query, HTTPException, Body, Request
+from fastapi.responses import JSONResponse
+from typing import Optional, List, Union
+from app.weather import get_weather, get_onecall_weather, get_weather_batch
+from app.weather_projection import exclude_for
+from app.model_router import get_router
 from app import assistant_api
-import tempfile
+from app.memory import MemoryStore
+from app.memory_index import to_timestamp
+from app.memory_gc import collect_garbage, DEFAULT_MIN_AGE
+from app.memory_lifecycle import MemoryCompactor
+from app.memory_jobs import start_job, get_job
+from app.rate_limiter import limiter_stats
+from app.circuit_breaker import CircuitOpen, breaker_stats
+from app.deadline import DeadlineExceeded
+from app.deadline_middleware import DeadlineMiddleware
+from app.compression import CompressionMiddleware
+from app.responses import FastJSONResponse, StreamingJSONArray
+from openai import APITimeoutError
+import os
+import multiprocessing
+import threading
 
-app = FastAPI()
+# Safe to run with several worker processes: assistant bootstrap and compaction are file-locked
+# and caches live in a shared SQLite file (app/shared_cache.py). Rate limits are per process, so
+# set WEB_CONCURRENCY to the worker count to split them, e.g.
+#   WEB_CONCURRENCY=4 uvicorn app.main:app --workers 4
+app = FastAPI(default_response_class=FastJSONResponse)
+# gzip/brotli for responses of COMPRESS_MIN_SIZE bytes or more, negotiated from Accept-Encoding
+app.add_middleware(CompressionMiddleware)
+# Every request gets a deadline (REQUEST_TIMEOUT, or the X-Request-Timeout header) that caps all upstream calls
+app.add_middleware(DeadlineMiddleware)
 
-llm_client = OpenRouterClient()
+llm_router = get_router()
+memory_store = MemoryStore()
+memory_compactor = MemoryCompactor(memory_store, llm=llm_router)
+
+@app.on_event("startup")
+def warn_on_undivided_limits():
+    # uvicorn --workers spawns workers via multiprocessing but does not export the count
+    if multiprocessing.parent_process() is not None and not os.getenv("WEB_CONCURRENCY"):
+        print("[startup] running as a worker process without WEB_CONCURRENCY: each worker gets the "
+              "full upstream rate limits, so the total can exceed the provider quota")
+
+@app.on_event("startup")
+def backfill_memory_index():
+    # Memories saved before the local index existed, or by another host, show up in /memory/list once indexed
+    def sync():
+        try:
+            print(f"[startup] memory index sync: {memory_store.sync_index(max_age=0)}")
+        except Exception as e:
+            print(f"[startup] memory index sync failed: {e}")
+    threading.Thread(target=sync, name="memory-index-sync", daemon=True).start()
+
+@app.on_event("startup")
+def start_memory_compaction():
+    # Opt-in background compaction, e.g. MEMORY_COMPACTION_INTERVAL=21600 for every 6 hours
+    interval = os.getenv("MEMORY_COMPACTION_INTERVAL")
+    if interval:
+        memory_compactor.start(float(interval))
+
+@app.exception_handler(DeadlineExceeded)
+@app.exception_handler(APITimeoutError)
+def deadline_exceeded_handler(request: Request, exc: Exception):
+    return JSONResponse(status_code=504, content={"detail": str(exc) or "Request deadline exceeded"})
+
+@app.exception_handler(CircuitOpen)
+def circuit_open_handler(request: Request, exc: CircuitOpen):
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "30"})
 
 @app.get("/")
 def root():
     return {"status": "Memir backend is live!"}
 
+@app.get("/limits")
+def rate_limits():
+    """Rate limiter queue/wait stats and circuit breaker state for each upstream provider."""
+    return {"limits": limiter_stats(), "breakers": breaker_stats()}
+
 @app.get("/weather")
 def weather_endpoint(
     city: str = Query("London", description="City name"),
@@ -25,6 +89,22 @@ def weather_endpoint(
         if data is None:
             raise HTTPException(status_code=404, detail="Weather data unavailable.")
         return data
+    except (CircuitOpen, DeadlineExceeded):
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/weather/batch")
+def weather_batch_endpoint(
+    locations: List[Union[int, str, dict]] = Body(..., description="City IDs, 'City,CC' strings or {city, country_code, city_id} objects"),
+    units: str = Body("metric", description="Units: metric or imperial")
+):
+    if not locations:
+        raise HTTPException(status_code=400, detail="No locations given.")
+    try:
+        return get_weather_batch(locations, units=units)
+    except (CircuitOpen, DeadlineExceeded):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -67,7 +147,7 @@ def run_assistant(thread_id: str, instructions: Optional[str] = Body(None)):
         tool_call_handler  # <-- Centralized dispatcher handles everything
     )
 
-    return run_result
+    return FastJSONResponse(run_result)
 
 
 @app.get("/thread/{thread_id}/run/{run_id}/status")
@@ -76,45 +156,161 @@ def get_run_status(thread_id: str, run_id: str):
     return status
 
 @app.get("/thread/{thread_id}/messages")
-def get_thread_messages(thread_id: str):
-    messages = assistant_api.get_messages(thread_id)
-    return {"messages": messages}
+def get_thread_messages(
+    thread_id: str,
+    limit: int = Query(100, ge=1, le=100, description="Messages per page"),
+    after: Optional[str] = Query(None, description="Cursor: the last_id of the previous page")
+):
+    # One upstream page per request, so a failure is a clean error status rather than a truncated body
+    return FastJSONResponse(assistant_api.get_messages_page(thread_id, limit=limit, after=after))
 
 # --- Memory File Endpoints (Vector Store) ---
 @app.post("/memory/upload")
-def upload_memory_file(text: str = Body(...)):
-    # Write text to a temp file and upload
-    with tempfile.NamedTemporaryFile(delete=False, mode="w", encoding="utf-8", suffix=".txt") as f:
-        f.write(text)
-        file_path = f.name
-    file_id = assistant_api.upload_memory_file(file_path)
+def upload_memory_file(
+    memory: Union[str, dict] = Body(..., description='The text, or {"text", "ttl", "importance", "tag"}')
+):
+    """
+    Save a memory. A bare JSON string is stored as is; an object can also set `ttl`
+    (seconds until compaction expires it), `importance` (0-1) and `tag`.
+    """
+    if isinstance(memory, str):
+        memory = {"text": memory}
+    text, ttl, importance = memory.get("text"), memory.get("ttl"), memory.get("importance")
+    if not isinstance(text, str) or not text.strip():
+        raise HTTPException(status_code=400, detail="text must be a non-empty string.")
+    try:
+        ttl = float(ttl) if ttl is not None else None
+        importance = float(importance) if importance is not None else None
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="ttl and importance must be numbers.")
+    if (ttl is not None and ttl <= 0) or (importance is not None and not 0 <= importance <= 1):
+        raise HTTPException(status_code=400, detail="ttl must be positive and importance between 0 and 1.")
+    metadata = {"tag": memory["tag"]} if memory.get("tag") else None
+    # Saved through the memory store, so it is indexed and shows up in /memory/list
+    file_id = memory_store.add_memory(text, metadata, ttl=ttl, importance=importance)["id"]
     return {"file_id": file_id}
 
+@app.delete("/memory", status_code=202)
+def delete_memories(
+    ids: Optional[List[str]] = Body(None, embed=True, description="Memory ids to delete"),
+    tag: Optional[List[str]] = Query(None, description="Delete memories with this tag (repeatable)"),
+    since: Optional[str] = Query(None, description="Created at or after (epoch seconds or ISO-8601)"),
+    until: Optional[str] = Query(None, description="Created at or before (epoch seconds or ISO-8601)")
+):
+    """
+    Bulk delete by ids and/or filter. Runs as a background job (concurrent bounded batches at
+    background priority, no request deadline); poll GET /memory/jobs/{id} for the report.
+    """
+    filters = _memory_filters(tag, since, until)
+    if not ids and not filters:
+        raise HTTPException(status_code=400, detail="Give ids or at least one filter (tag, since, until).")
+    targets = list(ids or [])
+    if filters:
+        targets += [memory["id"] for memory in memory_store.index.query(filters)]
+    return start_job("delete", memory_store.remove_memories, targets)
+
+@app.post("/memory/gc", status_code=202)
+def memory_gc(
+    dry_run: bool = Query(True, description="Only report what would be removed"),
+    min_age: float = Query(DEFAULT_MIN_AGE, ge=0, description="Only touch objects older than this (s)"),
+    include_legacy: bool = Query(False, description="Also collect unattached tmp*.txt files from before the memir_ prefix")
+):
+    """
+    Reconcile temp files, this app's OpenAI files, vector-store attachments and index rows. Runs as a
+    background job, since listing and deleting can outlast the request deadline; the job's report lists orphans.
+    """
+    return start_job("gc", collect_garbage, memory_store, dry_run=dry_run, min_age=min_age,
+                     include_legacy=include_legacy)
+
+@app.get("/memory/jobs/{job_id}")
+def memory_job(job_id: str):
+    """Status of a bulk delete or GC job; `report` is set once `status` is "done"."""
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job.")
+    return job
+
 @app.get("/memory/list")
-def list_memories():
-    return {"memories": assistant_api.list_memory_files()}
+def list_memories(
+    tag: Optional[List[str]] = Query(None, description="Only memories with this tag (repeatable)"),
+    since: Optional[str] = Query(None, description="Created at or after (epoch seconds or ISO-8601)"),
+    until: Optional[str] = Query(None, description="Created at or before (epoch seconds or ISO-8601)")
+):
+    # Always answered from the local index, filtered or not, so every item has the same shape
+    filters = _memory_filters(tag, since, until)
+    return StreamingJSONArray("memories", memory_store.iter_memories(filters))
+
+@app.get("/memory/search")
+def search_memories(
+    q: str = Query(..., description="Search query"),
+    n_results: int = Query(5, ge=1, le=50),
+    tag: Optional[List[str]] = Query(None, description="Only memories with this tag (repeatable)"),
+    since: Optional[str] = Query(None, description="Created at or after (epoch seconds or ISO-8601)"),
+    until: Optional[str] = Query(None, description="Created at or before (epoch seconds or ISO-8601)")
+):
+    filters = _memory_filters(tag, since, until)
+    return {"results": memory_store.search_memories(q, n_results=n_results, filters=filters)}
+
+@app.post("/memory/compact")
+def compact_memories():
+    """Expire stale memories and consolidate small related ones; returns the size/latency report."""
+    return memory_compactor.run_once()
+
+@app.get("/memory/{memory_id}/provenance")
+def memory_provenance(memory_id: str):
+    return {"sources": memory_store.index.provenance(memory_id)}
+
+def _memory_filters(tag, since, until) -> dict:
+    filters = {}
+    if tag:
+        filters["tag"] = tag
+    for key, value in (("since", since), ("until", until)):
+        if value:
+            try:
+                filters[key] = to_timestamp(float(value) if value.replace(".", "", 1).isdigit() else value)
+            except ValueError:
+                raise HTTPException(status_code=400, detail=f"Invalid {key}: expected epoch seconds or ISO-8601, got {value!r}")
+    return filters
 
 # --- LLM Endpoint (Direct, also available as function tool) ---
 @app.post("/llm/complete")
-def llm_complete(prompt: str = Body(...), model: str = Body("openai/gpt-4.1-nano"), max_tokens: int = Body(1000), temperature: float = Body(0.7)):
+def llm_complete(prompt: str = Body(...), model: Optional[str] = Body(None), max_tokens: int = Body(1000), temperature: float = Body(0.7), cascade: bool = Body(False)):
+    # model=None lets the router pick; cascade=True tries cheap models first (short planning calls)
     try:
-        response = llm_client.complete(prompt, model=model, max_tokens=max_tokens, temperature=temperature)
+        if cascade:
+            return llm_router.cascade(prompt, max_tokens=max_tokens, temperature=temperature)
+        response = llm_router.complete(prompt, model=model, max_tokens=max_tokens, temperature=temperature)
         return response
+    except (CircuitOpen, DeadlineExceeded):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/llm/routing")
+def llm_routing():
+    """Routing config, per-model latency/error percentiles and recent routing decisions."""
+    return llm_router.stats()
+
 @app.get("/onecall")
 def onecall_endpoint(
     lat: float = Query(..., description="Latitude"),
     lon: float = Query(..., description="Longitude"),
     units: str = Query("metric", description="Units: metric or imperial"),
     lang: str = Query("en", description="Language code"),
-    exclude: Optional[str] = Query(None, description="Comma-separated parts to exclude (e.g., minutely,hourly)")
+    exclude: Optional[str] = Query(None, description="Comma-separated parts to exclude (e.g., minutely,hourly)"),
+    fields: Optional[str] = Query(None, description="Comma-separated fields needed (current,next_hour,hourly,daily,alerts); derives exclude")
 ):
+    if fields and not exclude:
+        try:
+            exclude = exclude_for(f.strip() for f in fields.split(",") if f.strip()) or None
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
     try:
         data = get_onecall_weather(lat=lat, lon=lon, units=units, lang=lang, exclude=exclude)
         if data is None:
             raise HTTPException(status_code=404, detail="One Call weather data unavailable.")
-        return data
+        return FastJSONResponse(data)
+    except (HTTPException, CircuitOpen, DeadlineExceeded):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,87 +1,220 @@
 import os
-from typing import List, Dict, Any
+import time
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Callable
 import tempfile
-from openai import OpenAI
+from openai import NotFoundError
 from fastapi import HTTPException
+from app.circuit_breaker import admit
+from app.openai_client import client, VECTOR_STORE_ID
+from app.rate_limiter import priority, BACKGROUND
+from app.memory_index import MemoryIndex, attribute_filter
+from app.file_lock import file_lock
+from app.shared_cache import get_cache, cache_key, cache_bump
 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-VECTOR_STORE_ID = "vs_680bc99d6aa481918e5a726356a0281a"
+MEMORY_SEARCH_CACHE_TTL = float(os.getenv("MEMORY_SEARCH_CACHE_TTL", "60"))
+MEMORY_DELETE_BATCH = int(os.getenv("MEMORY_DELETE_BATCH", "50"))
+MEMORY_DELETE_WORKERS = int(os.getenv("MEMORY_DELETE_WORKERS", "8"))
+# How often list_memories reconciles the local index with the vector store
+MEMORY_INDEX_SYNC_INTERVAL = float(os.getenv("MEMORY_INDEX_SYNC_INTERVAL", "3600"))
+
+# Local temp files written for uploads; memory_gc sweeps any left behind by a crash
+TEMP_PREFIX = "memir_"
+
+# OpenAI vector store files accept at most 16 attributes of str/number/bool
+MAX_ATTRIBUTES = 16
+
+
+def _attributes(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    attrs = {k: v for k, v in metadata.items() if isinstance(v, (str, int, float, bool))}
+    return dict(list(attrs.items())[:MAX_ATTRIBUTES])
+
+
+def write_temp_text(text: str) -> str:
+    """Write `text` to a TEMP_PREFIX temp file for upload; the caller removes it."""
+    with tempfile.NamedTemporaryFile(delete=False, mode="w", encoding="utf-8", prefix=TEMP_PREFIX, suffix=".txt") as f:
+        f.write(text)
+        return f.name
+
+
+def list_all(list_page: Callable[[], Any]) -> List[Any]:
+    """Every item of a paged OpenAI list call, one admitted request per page."""
+    admit("openai")
+    page = list_page()
+    items = list(page.data)
+    while page.has_next_page():
+        admit("openai")
+        page = page.get_next_page()
+        items.extend(page.data)
+    return items
+
+
+def run_bulk(fn: Callable[[str], Any], ids: Iterable[str], batch_size: int = MEMORY_DELETE_BATCH,
+             max_workers: int = MEMORY_DELETE_WORKERS, on_batch: Optional[Callable[[List[str]], None]] = None) -> Dict[str, Any]:
+    """
+    Call fn(id) for every id, `max_workers` at a time, one batch of `batch_size` ids
+    after another so a large request never floods the upstream. Runs at BACKGROUND
+    rate-limit priority. `on_batch` gets the ids that succeeded after each batch.
+    """
+    ids = list(dict.fromkeys(ids))
+    done, failed = [], {}
+    with priority(BACKGROUND), ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start:start + batch_size]
+            futures = {item: pool.submit(contextvars.copy_context().run, fn, item) for item in batch}
+            ok = []
+            for item, future in futures.items():
+                try:
+                    future.result()
+                    ok.append(item)
+                except Exception as e:
+                    failed[item] = str(e)
+            done.extend(ok)
+            if on_batch and ok:
+                on_batch(ok)
+    return {"done": done, "failed": failed}
 
-client = OpenAI(api_key=OPENAI_API_KEY)
 
 class MemoryStore:
-    def __init__(self):
+    def __init__(self, index: Optional[MemoryIndex] = None):
         self.vector_store_id = VECTOR_STORE_ID
         self.client = client
+        self.index = index or MemoryIndex()
 
     from fastapi import HTTPException
-    def add_memory(self, text: str, metadata: Dict[str, Any] = None) -> dict:
+    def add_memory(self, text: str, metadata: Dict[str, Any] = None, ttl: Optional[float] = None,
+                   importance: Optional[float] = None) -> dict:
+        """
+        Save a memory. `ttl` (seconds) makes it expire and be removed by compaction;
+        `importance` (0-1, default 0.5) protects it from consolidation when high.
+        """
         import traceback
         try:
-            # Write memory to a temp file
-            with tempfile.NamedTemporaryFile(delete=False, mode="w", encoding="utf-8", suffix=".txt") as f:
-                f.write(text)
-                file_path = f.name
-            # Upload file to OpenAI
-            with open(file_path, "rb") as f:
-                file_obj = self.client.files.create(file=f, purpose="assistants")
-            # Attach file to vector store
+            # Write memory to a temp file and upload it to OpenAI
+            file_path = write_temp_text(text)
+            try:
+                with open(file_path, "rb") as f:
+                    admit("openai")
+                    file_obj = self.client.files.create(file=f, purpose="assistants")
+            finally:
+                os.remove(file_path)
+            # Attach file to vector store, with metadata as filterable attributes
+            metadata = dict(metadata or {})
+            metadata.setdefault("created_at", int(time.time()))
+            if ttl is not None:
+                metadata["expires_at"] = int(metadata["created_at"] + ttl)
+            if importance is not None:
+                metadata["importance"] = float(importance)
+            admit("openai")
             self.client.vector_stores.files.create(
                 vector_store_id=self.vector_store_id,
-                file_id=file_obj.id
+                file_id=file_obj.id,
+                attributes=_attributes(metadata)
             )
-            os.remove(file_path)
+            self.index.add(file_obj.id, text, metadata)
+            cache_bump("memory_search")
             return {"id": file_obj.id}
         except Exception as e:
             tb = traceback.format_exc()
             print(f"[add_memory ERROR] {e}\n{tb}")
             raise HTTPException(status_code=500, detail=f"add_memory error: {e}")
 
-    def search_memories(self, query: str, n_results: int = 5) -> List[Dict[str, Any]]:
+    def search_memories(self, query: str, n_results: int = 5, filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Semantic search over memories. `filters` (see app.memory_index) are applied by the
+        vector store as attribute pre-filters, so only matching memories are ranked.
+        Returns dicts with id, score, document and attributes.
+        Results are cached across workers until the next add/remove.
+        """
+        key = cache_key(self.vector_store_id, query, n_results, filters)
+        return get_cache().get_or_compute(
+            "memory_search", key, MEMORY_SEARCH_CACHE_TTL,
+            lambda: self._search_memories(query, n_results, filters),
+            cache_if=lambda results: True
+        )
+
+    def _search_memories(self, query: str, n_results: int, filters: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
         # Use the Responses API with the file_search tool
+        tool = {
+            "type": "file_search",
+            "vector_store_ids": [self.vector_store_id],
+            "max_num_results": n_results
+        }
+        if filters:
+            tool["filters"] = attribute_filter(filters)
+        admit("openai")
         resp = self.client.responses.create(
             model="gpt-4o-mini",
             input=query,
-            tools=[{
-                "type": "file_search",
-                "vector_store_ids": [self.vector_store_id],
-                "max_num_results": n_results
-            }],
+            tools=[tool],
             include=["file_search_call.results"]
         )
         # Parse the output for file citations and results
         output = resp.output
         results = []
+        now = time.time()
         for item in output:
             if getattr(item, "type", None) == "file_search_call":
                 # If results are included, parse them
                 results_attr = getattr(item, "results", None)
                 if results_attr:
                     for res in results_attr:
-                        results.append(res)
+                        # Expired memories stay searchable until compaction removes them; hide them now
+                        expires_at = (res.attributes or {}).get("expires_at")
+                        if expires_at is not None and expires_at <= now:
+                            continue
+                        results.append({
+                            "id": res.file_id,
+                            "score": res.score,
+                            "document": res.text,
+                            "filename": res.filename,
+                            "attributes": res.attributes or {}
+                        })
         return results
 
-    def list_memories(self) -> List[Dict[str, Any]]:
-        import traceback
-        from fastapi import HTTPException
+    def list_memories(self, filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Memories in the vector store, newest first, answered from the local index. Filtered
+        or not, the answer comes from the same place and every item has the same shape.
+        The index is reconciled with the vector store first when its last sync is older
+        than MEMORY_INDEX_SYNC_INTERVAL; if that fails the index is listed as it is.
+        """
+        return list(self.iter_memories(filters))
+
+    def iter_memories(self, filters: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+        """Same as list_memories(), but rows are read from the index as they are consumed."""
         try:
-            # List files attached to the vector store
-            resp = self.client.vector_stores.files.list(vector_store_id=self.vector_store_id)
-            files = []
-            for file in resp.data:
-                # Print all attributes for debugging
-                print(f"[VectorStoreFile] {file.__dict__}")
-                file_info = {"id": getattr(file, "id", None)}
-                # Add other known attributes if available
-                for attr in ["created_at", "object", "size", "status", "usage_bytes", "purpose", "display_name"]:
-                    if hasattr(file, attr):
-                        file_info[attr] = getattr(file, attr)
-                files.append(file_info)
-            return files
+            self.sync_index(max_age=MEMORY_INDEX_SYNC_INTERVAL)
         except Exception as e:
-            tb = traceback.format_exc()
-            print(f"[list_memories ERROR] {e}\n{tb}")
-            raise HTTPException(status_code=500, detail=f"list_memories error: {e}")
+            print(f"[list_memories] index sync failed, listing the local index as is: {e}")
+        return self.index.iter_query(filters)
+
+    def sync_index(self, max_age: Optional[float] = None) -> Optional[Dict[str, int]]:
+        """
+        Backfill the local index from the vector store: memories saved before the index
+        existed, or by another host, get a row with their text and attributes. Skipped
+        (returns None) if the last sync is younger than `max_age` seconds or another
+        process is already syncing.
+        """
+        if max_age is not None and time.time() - self.index.last_synced() < max_age:
+            return None
+        with file_lock(self.index.path + ".sync.lock", blocking=False) as acquired:
+            if not acquired:
+                return None
+            started = time.time()
+            with priority(BACKGROUND):
+                files = list_all(lambda: self.client.vector_stores.files.list(vector_store_id=self.vector_store_id, limit=100))
+                by_id = {f.id: f for f in files}
+                missing = self.index.missing(by_id)
+                for file_id in missing:
+                    parts = list_all(lambda: self.client.vector_stores.files.content(file_id, vector_store_id=self.vector_store_id))
+                    metadata = dict(by_id[file_id].attributes or {})
+                    metadata.setdefault("created_at", by_id[file_id].created_at)
+                    # add_memory may have indexed it meanwhile, with the full metadata; keep that row
+                    self.index.add(file_id, "".join(part.text or "" for part in parts), metadata, replace=False)
+            self.index.mark_synced(started)
+        return {"seen": len(files), "added": len(missing)}
 
     def remove_memory(self, memory_id) -> bool:
         import traceback
@@ -90,14 +223,47 @@ class MemoryStore:
             # Accept either dict or string as memory_id
             if isinstance(memory_id, dict) and "id" in memory_id:
                 memory_id = memory_id["id"]
-            # Remove file from vector store and delete it
-            self.client.vector_stores.files.delete(
-                vector_store_id=self.vector_store_id,
-                file_id=memory_id
-            )
-            self.client.files.delete(file_id=memory_id)
-            return True
+            removed = self._delete_file(memory_id)
+            # Drop the row either way so a stale index entry does not outlive its file
+            self.index.remove([memory_id])
+            if removed:
+                cache_bump("memory_search")
+            return removed
         except Exception as e:
             tb = traceback.format_exc()
             print(f"[remove_memory ERROR] {e}\n{tb}")
             raise HTTPException(status_code=500, detail=f"remove_memory error: {e}")
+
+    def _delete_file(self, memory_id: str) -> bool:
+        # Detach from the vector store, then delete the file; either may already be gone.
+        # Returns False only when neither existed.
+        found = False
+        try:
+            admit("openai")
+            self.client.vector_stores.files.delete(vector_store_id=self.vector_store_id, file_id=memory_id)
+            found = True
+        except NotFoundError:
+            pass
+        try:
+            admit("openai")
+            self.client.files.delete(file_id=memory_id)
+            found = True
+        except NotFoundError:
+            pass
+        return found
+
+    def remove_memories(self, memory_ids: Iterable[str], batch_size: int = MEMORY_DELETE_BATCH,
+                        max_workers: int = MEMORY_DELETE_WORKERS) -> Dict[str, Any]:
+        """
+        Delete many memories concurrently in bounded batches (see run_bulk). Index rows
+        are dropped after each batch; failures are reported per id, not raised.
+        """
+        started = time.monotonic()
+        result = run_bulk(self._delete_file, memory_ids, batch_size, max_workers, on_batch=self.index.remove)
+        if result["done"]:
+            cache_bump("memory_search")
+        return {
+            "deleted": result["done"],
+            "failed": result["failed"],
+            "duration": time.monotonic() - started,
+        }
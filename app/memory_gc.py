@@ -0,0 +1,136 @@
+"""
+Garbage collection for memory storage.
+
+Reconciles the four places a memory leaves traces and removes what is orphaned:
+- local temp files (TEMP_PREFIX) left behind by crashed uploads,
+- OpenAI `files` this app uploaded (a TEMP_PREFIX filename, or an id in the
+  local index) that are no longer attached to the vector store, e.g. uploads
+  that failed half-way. Other files on the account are never touched,
+  unless `include_legacy` also claims the `tmp*.txt` names that uploads had
+  before TEMP_PREFIX existed (only safe when nothing else on the account
+  uploads files named like that),
+- vector-store attachments whose file has been deleted,
+- local index rows for memories that are no longer in the vector store.
+
+Only objects older than `min_age` are touched, so uploads in flight are never
+collected. Deletions go through run_bulk (bounded concurrent batches at BACKGROUND
+priority). The report gives counts and reclaimed bytes per category.
+
+The CLI only reports unless --delete is given.
+
+Usage:
+    python -m app.memory_gc                    # dry run
+    python -m app.memory_gc --delete --min-age 86400
+    python -m app.memory_gc --include-legacy   # also report pre-TEMP_PREFIX tmp*.txt uploads
+"""
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+import tempfile
+from typing import Dict, Any, List, Optional
+
+from app.circuit_breaker import admit
+from app.memory import MemoryStore, TEMP_PREFIX, run_bulk, list_all
+from app.rate_limiter import priority, BACKGROUND
+from app.shared_cache import cache_bump
+
+DEFAULT_MIN_AGE = 3600.0
+
+# NamedTemporaryFile's default prefix, used for uploads before TEMP_PREFIX
+LEGACY_TEMP_PREFIX = "tmp"
+
+
+def _sweep_temp_files(cutoff: float, dry_run: bool) -> Dict[str, Any]:
+    count = size = 0
+    for path in glob.glob(os.path.join(tempfile.gettempdir(), f"{TEMP_PREFIX}*.txt")):
+        try:
+            stat = os.stat(path)
+            if stat.st_mtime > cutoff:
+                continue
+            if not dry_run:
+                os.remove(path)
+        except FileNotFoundError:
+            continue
+        count += 1
+        size += stat.st_size
+    return {"count": count, "bytes": size}
+
+
+def _created_here(file: Any, indexed_ids: set, include_legacy: bool = False) -> bool:
+    filename = file.filename or ""
+    if include_legacy and filename.startswith(LEGACY_TEMP_PREFIX) and filename.endswith(".txt"):
+        return True
+    return file.id in indexed_ids or filename.startswith(TEMP_PREFIX)
+
+
+def collect_garbage(store: Optional[MemoryStore] = None, dry_run: bool = True,
+                    min_age: float = DEFAULT_MIN_AGE, include_legacy: bool = False) -> Dict[str, Any]:
+    """Find (and unless `dry_run`, delete) orphaned memory objects; returns the report."""
+    store = store or MemoryStore()
+    client = store.client
+    started = time.monotonic()
+    cutoff = time.time() - min_age
+
+    with priority(BACKGROUND):
+        files = list_all(lambda: client.files.list(purpose="assistants", limit=100))
+        attached = list_all(lambda: client.vector_stores.files.list(vector_store_id=store.vector_store_id, limit=100))
+
+    file_ids = {f.id for f in files}
+    attached_ids = {a.id for a in attached}
+    rows = store.index.query()
+    indexed_ids = {row["id"] for row in rows}
+    orphan_files = [f for f in files
+                    if f.id not in attached_ids and (f.created_at or 0) <= cutoff and _created_here(f, indexed_ids, include_legacy)]
+    dangling = [a.id for a in attached if a.id not in file_ids and (a.created_at or 0) <= cutoff]
+    stale_rows = [row["id"] for row in rows if row["id"] not in attached_ids and row["created_at"] <= cutoff]
+
+    report = {
+        "dry_run": dry_run,
+        "temp_files": _sweep_temp_files(cutoff, dry_run),
+        "orphan_files": {"count": len(orphan_files), "bytes": sum(f.bytes or 0 for f in orphan_files)},
+        "dangling_attachments": {"count": len(dangling)},
+        "stale_index_rows": {"count": len(stale_rows)},
+        "files_seen": len(files),
+        "attachments_seen": len(attached),
+        "failed": {},
+    }
+    if not dry_run:
+        def delete_file(file_id: str):
+            admit("openai")
+            client.files.delete(file_id=file_id)
+
+        def detach(file_id: str):
+            admit("openai")
+            client.vector_stores.files.delete(vector_store_id=store.vector_store_id, file_id=file_id)
+
+        deleted = run_bulk(delete_file, [f.id for f in orphan_files])
+        detached = run_bulk(detach, dangling)
+        report["failed"] = {**deleted["failed"], **detached["failed"]}
+        report["orphan_files"]["count"] = len(deleted["done"])
+        done = set(deleted["done"])
+        report["orphan_files"]["bytes"] = sum(f.bytes or 0 for f in orphan_files if f.id in done)
+        report["dangling_attachments"]["count"] = len(detached["done"])
+        store.index.remove(stale_rows)
+        if detached["done"] or stale_rows:
+            cache_bump("memory_search")
+    report["duration"] = time.monotonic() - started
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Remove orphaned memory files, attachments and index rows")
+    parser.add_argument("--delete", action="store_true", help="Delete what is found (default: only report it)")
+    parser.add_argument("--min-age", type=float, default=DEFAULT_MIN_AGE, help="Only touch objects older than this (s)")
+    parser.add_argument("--include-legacy", action="store_true",
+                        help=f"Also treat unattached {LEGACY_TEMP_PREFIX}*.txt files as this app's (pre-{TEMP_PREFIX} uploads)")
+    args = parser.parse_args(argv)
+    report = collect_garbage(dry_run=not args.delete, min_age=args.min_age, include_legacy=args.include_legacy)
+    print(json.dumps(report, indent=2))
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
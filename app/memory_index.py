@@ -0,0 +1,251 @@
+"""
+Local SQLite index of memory metadata.
+
+Every memory saved through MemoryStore gets a row here with its text, tag,
+creation time and full metadata, with secondary indexes on tag and created_at.
+Filtered listing is answered from this index instead of paging through the whole
+vector store, and the same filters are translated into OpenAI attribute filters
+so file_search pre-filters before ranking.
+
+Filters are a dict:
+    {"tag": "work"}                         # or a list of tags
+    {"since": "2025-05-01", "until": ...}   # epoch seconds or ISO-8601
+    {"tag": "grocery", "test": False}       # any other key matches that metadata value
+"""
+import os
+import json
+import time
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Optional, Dict, Any, List, Iterable, Iterator
+
+MEMORY_INDEX_PATH = os.getenv("MEMORY_INDEX_PATH", os.path.join(os.path.dirname(__file__), "memory_index.sqlite3"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS memories (
+    id TEXT PRIMARY KEY,
+    text TEXT,
+    tag TEXT,
+    created_at REAL NOT NULL,
+    size INTEGER NOT NULL DEFAULT 0,
+    metadata TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS idx_memories_tag_created ON memories (tag, created_at);
+CREATE INDEX IF NOT EXISTS idx_memories_created ON memories (created_at);
+CREATE TABLE IF NOT EXISTS index_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS provenance (
+    memory_id TEXT NOT NULL,
+    source_id TEXT NOT NULL,
+    source_text TEXT,
+    source_created_at REAL,
+    PRIMARY KEY (memory_id, source_id)
+);
+"""
+
+# Columns added after the first release of the index; created on open if missing
+LIFECYCLE_COLUMNS = {
+    "expires_at": "REAL",
+    "importance": "REAL NOT NULL DEFAULT 0.5",
+}
+
+def to_timestamp(value) -> float:
+    """Accept epoch seconds or an ISO-8601 date/datetime string."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    return datetime.fromisoformat(str(value)).timestamp()
+
+
+def attribute_filter(filters: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Translate a filter dict into an OpenAI vector store attribute filter."""
+    if not filters:
+        return None
+    clauses = []
+    for key, value in filters.items():
+        if key == "since":
+            clauses.append({"type": "gte", "key": "created_at", "value": int(to_timestamp(value))})
+        elif key == "until":
+            clauses.append({"type": "lte", "key": "created_at", "value": int(to_timestamp(value))})
+        elif isinstance(value, (list, tuple, set)):
+            options = [{"type": "eq", "key": key, "value": v} for v in value]
+            clauses.append(options[0] if len(options) == 1 else {"type": "or", "filters": options})
+        else:
+            clauses.append({"type": "eq", "key": key, "value": value})
+    return clauses[0] if len(clauses) == 1 else {"type": "and", "filters": clauses}
+
+
+class MemoryIndex:
+    def __init__(self, path: str = MEMORY_INDEX_PATH):
+        self.path = path
+        with self._connect() as conn:
+            # WAL so several worker processes can read while one writes
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            existing = {row["name"] for row in conn.execute("PRAGMA table_info(memories)")}
+            for column, decl in LIFECYCLE_COLUMNS.items():
+                if column not in existing:
+                    conn.execute(f"ALTER TABLE memories ADD COLUMN {column} {decl}")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_memories_expires ON memories (expires_at)")
+
+    @contextmanager
+    def _connect(self, **kwargs):
+        conn = sqlite3.connect(self.path, timeout=30, **kwargs)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def add(self, memory_id: str, text: str, metadata: Optional[Dict[str, Any]] = None, created_at: Optional[float] = None,
+            replace: bool = True):
+        """Index a memory; with replace=False an existing row for the id is left as it is."""
+        metadata = dict(metadata or {})
+        created_at = created_at or metadata.get("created_at") or time.time()
+        verb = "REPLACE" if replace else "IGNORE"
+        with self._connect() as conn:
+            conn.execute(
+                f"INSERT OR {verb} INTO memories (id, text, tag, created_at, size, metadata, expires_at, importance)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (memory_id, text, metadata.get("tag"), created_at, len(text.encode("utf-8")), json.dumps(metadata),
+                 metadata.get("expires_at"), metadata.get("importance", 0.5)),
+            )
+
+    def remove(self, memory_ids: Iterable[str]) -> int:
+        ids = list(memory_ids)
+        if not ids:
+            return 0
+        with self._connect() as conn:
+            cur = conn.executemany("DELETE FROM memories WHERE id = ?", [(i,) for i in ids])
+            return cur.rowcount
+
+    def _where(self, filters: Optional[Dict[str, Any]]):
+        clauses, params = [], []
+        for key, value in (filters or {}).items():
+            if key == "since":
+                clauses.append("created_at >= ?")
+                params.append(to_timestamp(value))
+            elif key == "until":
+                clauses.append("created_at <= ?")
+                params.append(to_timestamp(value))
+            else:
+                column = "tag" if key == "tag" else "json_extract(metadata, ?)"
+                if column != "tag":
+                    params.append(f"$.{key}")
+                values = list(value) if isinstance(value, (list, tuple, set)) else [value]
+                clauses.append(f"{column} IN ({', '.join('?' for _ in values)})")
+                params.extend(values)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def query(self, filters: Optional[Dict[str, Any]] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Memories matching `filters`, newest first."""
+        return list(self.iter_query(filters, limit))
+
+    def iter_query(self, filters: Optional[Dict[str, Any]] = None, limit: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Like query(), but yields rows straight from the cursor so a long listing can be
+        streamed without loading it first. The connection stays open until the iterator
+        is exhausted or closed; it may be advanced from different threads (as
+        StreamingResponse does), one at a time.
+        """
+        where, params = self._where(filters)
+        sql = f"SELECT * FROM memories{where} ORDER BY created_at DESC"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._connect(check_same_thread=False) as conn:
+            cursor = conn.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(500)
+                if not rows:
+                    break
+                for row in rows:
+                    yield self._row(row)
+
+    def missing(self, memory_ids: Iterable[str]) -> List[str]:
+        """The ids in `memory_ids` that have no row in the index."""
+        ids = list(memory_ids)
+        found = set()
+        with self._connect() as conn:
+            # Chunked to stay under SQLite's bound-parameter limit
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                rows = conn.execute(f"SELECT id FROM memories WHERE id IN ({', '.join('?' for _ in chunk)})", chunk)
+                found.update(row["id"] for row in rows)
+        return [i for i in ids if i not in found]
+
+    def last_synced(self) -> float:
+        """When the index was last reconciled with the vector store (0 if never)."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM index_meta WHERE key = 'synced_at'").fetchone()
+        return float(row["value"]) if row else 0.0
+
+    def mark_synced(self, when: Optional[float] = None):
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO index_meta (key, value) VALUES ('synced_at', ?)", (str(when or time.time()),))
+
+    # --- lifecycle ---------------------------------------------------------
+
+    def expired(self, now: Optional[float] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Memories whose TTL has run out, oldest expiry first."""
+        sql = "SELECT * FROM memories WHERE expires_at IS NOT NULL AND expires_at <= ? ORDER BY expires_at"
+        params = [now or time.time()]
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._connect() as conn:
+            return [self._row(row) for row in conn.execute(sql, params).fetchall()]
+
+    def consolidation_candidates(self, max_size: int, older_than: float, max_importance: float) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Small, old, unimportant memories grouped by tag (oldest first within a tag).
+        Memories with a TTL are left to expire instead: merging them into a permanent
+        summary would keep them forever.
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT * FROM memories WHERE size <= ? AND created_at <= ? AND importance < ?"
+                " AND expires_at IS NULL ORDER BY tag, created_at",
+                (max_size, older_than, max_importance),
+            ).fetchall()
+        groups: Dict[str, List[Dict[str, Any]]] = {}
+        for row in rows:
+            groups.setdefault(row["tag"] or "", []).append(self._row(row))
+        return groups
+
+    def add_provenance(self, memory_id: str, sources: Iterable[Dict[str, Any]]):
+        """Record which memories were merged into `memory_id`, keeping their original text."""
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO provenance (memory_id, source_id, source_text, source_created_at) VALUES (?, ?, ?, ?)",
+                [(memory_id, src["id"], src.get("document"), src.get("created_at")) for src in sources],
+            )
+
+    def provenance(self, memory_id: str) -> List[Dict[str, Any]]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT source_id, source_text, source_created_at FROM provenance WHERE memory_id = ? ORDER BY source_created_at",
+                (memory_id,),
+            ).fetchall()
+        return [{"id": r["source_id"], "document": r["source_text"], "created_at": r["source_created_at"]} for r in rows]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT COUNT(*) AS count, COALESCE(SUM(size), 0) AS bytes FROM memories").fetchone()
+        return {"count": row["count"], "bytes": row["bytes"]}
+
+    @staticmethod
+    def _row(row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            "id": row["id"],
+            "document": row["text"],
+            "tag": row["tag"],
+            "created_at": row["created_at"],
+            "size": row["size"],
+            "expires_at": row["expires_at"],
+            "importance": row["importance"],
+            "metadata": json.loads(row["metadata"]),
+        }
@@ -0,0 +1,57 @@
+"""
+Background jobs for memory operations that outlive a request.
+
+Bulk deletes and garbage collection go through the BACKGROUND rate limiter in
+bounded batches, so a large one can take far longer than REQUEST_TIMEOUT. Their
+endpoints start a job here and answer at once with its id. The job runs in a
+daemon thread with no request deadline. Its status and final report are kept in
+the shared cache, so GET /memory/jobs/{id} works from any worker process.
+
+A job whose process dies before it finishes stays "running" until MEMORY_JOB_TTL
+expires; every step it took is safe to repeat.
+
+Usage Example:
+    job = start_job("delete", memory_store.remove_memories, ids)
+    get_job(job["id"])  # {"id": ..., "status": "done", "report": {...}}
+"""
+import os
+import time
+import uuid
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from app.deadline import no_deadline
+from app.shared_cache import get_cache
+
+# How long a job's status and report can be fetched after it was last updated
+MEMORY_JOB_TTL = float(os.getenv("MEMORY_JOB_TTL", "86400"))
+
+NAMESPACE = "memory_jobs"
+
+
+def _save(job: Dict[str, Any]):
+    get_cache().set(NAMESPACE, job["id"], job, ttl=MEMORY_JOB_TTL)
+
+
+def start_job(kind: str, fn: Callable[..., Any], *args, **kwargs) -> Dict[str, Any]:
+    """Run fn(*args, **kwargs) in a background thread; returns the job as first stored."""
+    job = {"id": uuid.uuid4().hex, "kind": kind, "status": "running", "started_at": time.time()}
+    _save(job)
+
+    def run():
+        state = dict(job)
+        with no_deadline():
+            try:
+                state.update(status="done", report=fn(*args, **kwargs))
+            except Exception as e:
+                print(f"[memory job {job['id']}] {kind} failed: {e}")
+                state.update(status="failed", error=str(e))
+        state["finished_at"] = time.time()
+        _save(state)
+
+    threading.Thread(target=run, name=f"memory-job-{kind}", daemon=True).start()
+    return dict(job)
+
+
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    return get_cache().get(NAMESPACE, job_id)
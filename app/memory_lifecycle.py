@@ -0,0 +1,225 @@
+"""
+Memory lifecycle: TTL expiry and consolidation of small related memories.
+
+A compaction run (all upstream calls made at BACKGROUND rate-limit priority):
+1. removes memories whose TTL has expired,
+2. clusters small, old, low-importance memories within each tag by embedding
+   similarity and asks the LLM to merge each cluster into one summarized memory,
+   recording provenance links to the originals in the local index before
+   removing them. Memories less similar than `min_similarity` to every cluster
+   are left alone, so unrelated facts that share a tag are never merged, and
+   memories with a TTL are never merged into a permanent summary,
+3. reports how much the store shrank and how search latency changed.
+
+Each run is capped at `max_ops` deletions/merges so a large backlog is worked
+off gradually instead of in one burst. Runs hold a non-blocking file lock next
+to the index, so with several worker processes only one compacts at a time and
+the others skip that round.
+
+Usage Example:
+    compactor = MemoryCompactor(MemoryStore())
+    print(compactor.run_once())
+    compactor.start(interval=6 * 3600)   # background thread
+"""
+import os
+import time
+import threading
+from typing import Optional, Dict, Any, List, Callable
+
+import numpy as np
+
+from app.file_lock import file_lock
+from app.memory import MemoryStore
+from app.rate_limiter import priority, BACKGROUND
+
+CONSOLIDATE_PROMPT = (
+    "Merge the following personal notes into one concise memory. Keep every distinct fact "
+    "(names, dates, quantities), drop duplicates, and do not add anything new. "
+    "Reply with the merged memory only.\n\n"
+)
+
+
+class MemoryCompactor:
+    def __init__(self, store: MemoryStore, llm=None,
+                 max_ops: int = 50,
+                 min_cluster: int = 3,
+                 max_cluster: int = 10,
+                 small_bytes: int = 280,
+                 min_age: float = 7 * 86400,
+                 max_importance: float = 0.8,
+                 min_similarity: Optional[float] = None,
+                 probe_query: Optional[str] = None,
+                 lock_path: Optional[str] = None,
+                 embed: Optional[Callable[[List[str]], List[List[float]]]] = None):
+        self.store = store
+        self._llm = llm
+        self.max_ops = max_ops
+        self.min_cluster = min_cluster
+        self.max_cluster = max_cluster
+        self.small_bytes = small_bytes
+        self.min_age = min_age
+        self.max_importance = max_importance
+        self.min_similarity = min_similarity if min_similarity is not None else float(os.getenv("MEMORY_CLUSTER_SIMILARITY", "0.6"))
+        self._embed = embed
+        self.probe_query = probe_query if probe_query is not None else os.getenv("MEMORY_COMPACTION_PROBE", "recent notes")
+        self.last_report: Optional[Dict[str, Any]] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._run_lock = threading.Lock()
+        self.lock_path = lock_path or os.getenv("MEMORY_COMPACTION_LOCK", store.index.path + ".compact.lock")
+
+    @property
+    def llm(self):
+        if self._llm is None:
+            from app.model_router import get_router
+            self._llm = get_router()
+        return self._llm
+
+    def _probe_latency(self) -> Optional[float]:
+        if not self.probe_query:
+            return None
+        start = time.monotonic()
+        try:
+            # Bypass the shared search cache, or an unchanged store would probe as a ~1 ms cache hit
+            self.store._search_memories(self.probe_query, 5, None)
+        except Exception as e:
+            print(f"[compaction] latency probe failed: {e}")
+            return None
+        return time.monotonic() - start
+
+    def _embeddings(self, texts: List[str]) -> List[List[float]]:
+        if self._embed is None:
+            from app.embedding import get_openai_embeddings
+            self._embed = get_openai_embeddings
+        return self._embed(texts)
+
+    def _clusters(self, memories: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """
+        Greedy single-pass clustering: each memory joins the first cluster whose
+        centroid it matches with cosine >= min_similarity, else starts a new one.
+        """
+        vectors = np.asarray(self._embeddings([m["document"] for m in memories]), dtype=np.float32)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        clusters: List[List[int]] = []
+        centroids: List[np.ndarray] = []
+        for i, vector in enumerate(vectors):
+            for c, centroid in enumerate(centroids):
+                if len(clusters[c]) < self.max_cluster and float(vector @ centroid) / np.linalg.norm(centroid) >= self.min_similarity:
+                    clusters[c].append(i)
+                    centroids[c] = centroid + vector
+                    break
+            else:
+                clusters.append([i])
+                centroids.append(vector.copy())
+        return [[memories[i] for i in cluster] for cluster in clusters]
+
+    def _summarize(self, memories: List[Dict[str, Any]]) -> str:
+        notes = "\n".join(f"- {m['document']}" for m in memories)
+        response = self.llm.complete(CONSOLIDATE_PROMPT + notes, max_tokens=400, temperature=0.2)
+        return response["choices"][0]["message"]["content"].strip()
+
+    def _expire(self, budget: int) -> int:
+        expired = [memory["id"] for memory in self.store.index.expired(limit=budget)]
+        if not expired:
+            return 0
+        result = self.store.remove_memories(expired)
+        for memory_id, error in result["failed"].items():
+            print(f"[compaction] failed to expire {memory_id}: {error}")
+        return len(result["deleted"])
+
+    def _consolidate(self, budget: int) -> Dict[str, int]:
+        merged = created = failed = 0
+        groups = self.store.index.consolidation_candidates(
+            max_size=self.small_bytes,
+            older_than=time.time() - self.min_age,
+            max_importance=self.max_importance,
+        )
+        for tag, memories in groups.items():
+            if len(memories) < self.min_cluster:
+                continue
+            try:
+                clusters = self._clusters(memories)
+            except Exception as e:
+                print(f"[compaction] embedding memories for tag '{tag}' failed: {e}")
+                failed += 1
+                continue
+            for cluster in clusters:
+                if len(cluster) < self.min_cluster or merged + len(cluster) > budget:
+                    continue
+                try:
+                    summary = self._summarize(cluster)
+                except Exception as e:
+                    print(f"[compaction] consolidation of tag '{tag}' failed: {e}")
+                    failed += 1
+                    continue
+                if not summary:
+                    continue
+                metadata = {
+                    "tag": tag or "consolidated",
+                    "consolidated": True,
+                    "source_count": len(cluster),
+                    "importance": max(m["importance"] or 0.5 for m in cluster),
+                }
+                try:
+                    new_id = self.store.add_memory(summary, metadata)["id"]
+                except Exception as e:
+                    print(f"[compaction] saving consolidated memory for tag '{tag}' failed: {e}")
+                    failed += 1
+                    continue
+                # Provenance first, so a crash below never loses the link to the originals
+                self.store.index.add_provenance(new_id, cluster)
+                created += 1
+                for memory in cluster:
+                    try:
+                        self.store.remove_memory(memory["id"])
+                        merged += 1
+                    except Exception as e:
+                        print(f"[compaction] failed to remove merged memory {memory['id']}: {e}")
+        return {"merged": merged, "created": created, "failed": failed}
+
+    def run_once(self) -> Dict[str, Any]:
+        """Run one compaction pass and return a report of what changed."""
+        with self._run_lock, file_lock(self.lock_path, blocking=False) as acquired, priority(BACKGROUND):
+            if not acquired:
+                return {"skipped": True, "reason": "compaction is already running in another process"}
+            started = time.monotonic()
+            before = self.store.index.stats()
+            latency_before = self._probe_latency()
+            expired = self._expire(self.max_ops)
+            consolidated = self._consolidate(self.max_ops - expired)
+            after = self.store.index.stats()
+            latency_after = self._probe_latency()
+            report = {
+                "expired": expired,
+                "consolidated": consolidated["merged"],
+                "summaries_created": consolidated["created"],
+                "consolidation_failures": consolidated["failed"],
+                "memories_before": before["count"],
+                "memories_after": after["count"],
+                "bytes_before": before["bytes"],
+                "bytes_after": after["bytes"],
+                "search_latency_before": latency_before,
+                "search_latency_after": latency_after,
+                "duration": time.monotonic() - started,
+            }
+            self.last_report = report
+            return report
+
+    def _loop(self, interval: float):
+        while not self._stop.wait(interval):
+            try:
+                report = self.run_once()
+                print(f"[compaction] {report}")
+            except Exception as e:
+                print(f"[compaction] run failed: {e}")
+
+    def start(self, interval: float):
+        """Run compaction every `interval` seconds on a daemon thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, args=(interval,), name="memory-compaction", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
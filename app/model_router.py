@@ -0,0 +1,323 @@
+"""
+Latency-aware model routing for OpenRouter completions.
+
+The router keeps a rolling window of latencies and errors per model and uses it to:
+- pick the healthiest configured model as primary,
+- send a hedged duplicate to a fallback model when the primary runs past its p95,
+  keeping whichever answer arrives first,
+- run cheap-first cascades for short tool-planning calls, escalating only when the
+  cheap model's answer is unusable.
+
+Configuration (env):
+    LLM_PRIMARY_MODEL    default "openai/gpt-4.1-nano"
+    LLM_FALLBACK_MODELS  comma-separated, default "openai/gpt-4o-mini"
+    LLM_CASCADE_MODELS   comma-separated, cheapest first
+    LLM_HEDGE            "0" disables hedging
+    LLM_HEDGE_DELAY      seconds to wait before hedging when a model has too few samples
+    LLM_ROUTER_WORKERS   size of the call pool, default 32; set it to the expected
+                         number of concurrent completions (plus room for hedges)
+
+Usage Example:
+    router = get_router()
+    response = router.complete("Summarize my day")
+    plan = router.cascade("Which tool should I call?", max_tokens=50)
+    print(router.stats())
+"""
+import os
+import time
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Optional, List, Dict, Any, Callable
+
+from app.openrouter_client import OpenRouterClient
+from app.circuit_breaker import CircuitOpen
+from app.deadline import remaining, DeadlineExceeded
+
+
+def _percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+class LatencyTracker:
+    """Rolling latency and error window for one model."""
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, latency: float, ok: bool):
+        with self._lock:
+            self._samples.append((latency, ok))
+
+    def _latencies(self) -> List[float]:
+        return [latency for latency, ok in self._samples if ok]
+
+    def percentile(self, pct: float) -> Optional[float]:
+        with self._lock:
+            return _percentile(self._latencies(), pct)
+
+    def error_rate(self) -> float:
+        with self._lock:
+            if not self._samples:
+                return 0.0
+            return sum(1 for _, ok in self._samples if not ok) / len(self._samples)
+
+    def count(self) -> int:
+        with self._lock:
+            return len(self._samples)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            latencies = self._latencies()
+            samples = len(self._samples)
+            errors = samples - len(latencies)
+        return {
+            "samples": samples,
+            "p50": _percentile(latencies, 50),
+            "p95": _percentile(latencies, 95),
+            "p99": _percentile(latencies, 99),
+            "error_rate": errors / samples if samples else 0.0,
+        }
+
+
+def default_accept(response: Dict[str, Any]) -> bool:
+    """A cascade answer is usable if it has content and was not cut off."""
+    try:
+        choice = response["choices"][0]
+    except (KeyError, IndexError, TypeError):
+        return False
+    content = (choice.get("message") or {}).get("content") or ""
+    return bool(content.strip()) and choice.get("finish_reason") != "length"
+
+
+def _env_models(name: str, default: str) -> List[str]:
+    return [m.strip() for m in os.getenv(name, default).split(",") if m.strip()]
+
+
+class ModelRouter:
+    def __init__(self, client: OpenRouterClient,
+                 primary: Optional[str] = None,
+                 fallbacks: Optional[List[str]] = None,
+                 cascade_models: Optional[List[str]] = None,
+                 hedge: Optional[bool] = None,
+                 hedge_delay: Optional[float] = None,
+                 min_samples: int = 5,
+                 max_error_rate: float = 0.5,
+                 max_workers: Optional[int] = None):
+        self.client = client
+        self.primary = primary or os.getenv("LLM_PRIMARY_MODEL", "openai/gpt-4.1-nano")
+        self.fallbacks = fallbacks if fallbacks is not None else _env_models("LLM_FALLBACK_MODELS", "openai/gpt-4o-mini")
+        self.cascade_models = cascade_models or _env_models("LLM_CASCADE_MODELS", ",".join([self.primary] + self.fallbacks))
+        self.hedge = hedge if hedge is not None else os.getenv("LLM_HEDGE", "1") != "0"
+        self.hedge_delay = hedge_delay if hedge_delay is not None else float(os.getenv("LLM_HEDGE_DELAY", "2.0"))
+        self.min_samples = min_samples
+        self.max_error_rate = max_error_rate
+        self._trackers: Dict[str, LatencyTracker] = {}
+        self._lock = threading.Lock()
+        max_workers = max_workers or int(os.getenv("LLM_ROUTER_WORKERS", "32"))
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm-route")
+        self._decisions = deque(maxlen=100)
+        self._counters = {"requests": 0, "hedged": 0, "hedge_wins": 0, "cascade_escalations": 0, "cascade_unaccepted": 0, "failovers": 0}
+
+    def tracker(self, model: str) -> LatencyTracker:
+        with self._lock:
+            if model not in self._trackers:
+                self._trackers[model] = LatencyTracker()
+            return self._trackers[model]
+
+    def _count(self, key: str):
+        with self._lock:
+            self._counters[key] += 1
+
+    def _healthy(self, model: str) -> bool:
+        tracker = self.tracker(model)
+        return tracker.count() < self.min_samples or tracker.error_rate() <= self.max_error_rate
+
+    def candidates(self, model: Optional[str] = None) -> List[str]:
+        """Requested (or configured) model first, then fallbacks; unhealthy models sink to the back."""
+        ordered = []
+        for name in [model or self.primary] + self.fallbacks:
+            if name not in ordered:
+                ordered.append(name)
+        return sorted(ordered, key=lambda name: not self._healthy(name))
+
+    def _hedge_after(self, model: str) -> float:
+        tracker = self.tracker(model)
+        if tracker.count() < self.min_samples:
+            return self.hedge_delay
+        p95 = tracker.percentile(95)
+        return p95 if p95 is not None else self.hedge_delay
+
+    def _call(self, model: str, prompt: str, **kwargs) -> Dict[str, Any]:
+        start = time.monotonic()
+        try:
+            response = self.client.complete(prompt, model=model, **kwargs)
+        except Exception:
+            self.tracker(model).record(time.monotonic() - start, ok=False)
+            raise
+        self.tracker(model).record(time.monotonic() - start, ok=True)
+        return response
+
+    def _submit(self, model: str, prompt: str, **kwargs) -> Future:
+        # Copy the caller's context so rate-limit priority follows the request into the pool.
+        ctx = contextvars.copy_context()
+        started: List[float] = []
+
+        def run():
+            started.append(time.monotonic())
+            return self._call(model, prompt, **kwargs)
+
+        future = self._executor.submit(ctx.run, run)
+        future.started = started
+        return future
+
+    @staticmethod
+    def _running_for(future: Future) -> float:
+        """Seconds since a pool worker picked the call up; time spent queued does not count."""
+        return time.monotonic() - future.started[0] if future.started else 0.0
+
+    def _record(self, decision: Dict[str, Any]):
+        with self._lock:
+            self._decisions.append(decision)
+
+    def complete(self, prompt: str, model: Optional[str] = None, **kwargs) -> Dict[str, Any]:
+        """
+        Complete a prompt on the best available model. If the primary has not answered
+        by its p95 latency, a duplicate is sent to the next candidate and the first
+        successful answer wins. The losing request is cancelled if it has not started;
+        an in-flight HTTP call cannot be aborted, so its result is simply discarded.
+        Waiting stops at the request deadline, and an open OpenRouter breaker or an
+        expired deadline is raised at once instead of failing over.
+        """
+        self._count("requests")
+        start = time.monotonic()
+        candidates = self.candidates(model)
+        primary, backups = candidates[0], candidates[1:]
+        decision = {"mode": "hedge" if self.hedge else "single", "primary": primary, "hedged_to": None}
+        watched = self._submit(primary, prompt, **kwargs)
+        pending = {watched: primary}
+        hedge_after = self._hedge_after(primary) if self.hedge and backups else None
+        errors = {}
+        while pending:
+            # The hedge clock runs from when the call started, not from when it was queued
+            hedge_wait = None if hedge_after is None else max(0.0, hedge_after - self._running_for(watched))
+            left = remaining()
+            hit_deadline = left is not None and (hedge_wait is None or left < hedge_wait)
+            done, _ = wait(pending, timeout=left if hit_deadline else hedge_wait, return_when=FIRST_COMPLETED)
+            if not done and hit_deadline:
+                if remaining() > 0:
+                    continue
+                for loser in pending:
+                    loser.cancel()
+                decision.update(winner=None, errors=errors, latency=time.monotonic() - start)
+                self._record(decision)
+                raise DeadlineExceeded(f"No model answered before the deadline: {list(pending.values())}")
+            if not done:
+                if self._running_for(watched) < hedge_after:
+                    continue
+                # Primary is slower than usual: hedge to the next candidate.
+                backup = backups.pop(0)
+                self._count("hedged")
+                decision["hedged_to"] = backup
+                pending[self._submit(backup, prompt, **kwargs)] = backup
+                hedge_after = None
+                continue
+            for future in done:
+                name = pending.pop(future)
+                try:
+                    response = future.result()
+                except (CircuitOpen, DeadlineExceeded):
+                    for loser in pending:
+                        loser.cancel()
+                    raise
+                except Exception as e:
+                    errors[name] = str(e)
+                    continue
+                for loser in pending:
+                    loser.cancel()
+                if name != primary:
+                    self._count("hedge_wins" if decision["hedged_to"] == name else "failovers")
+                decision.update(winner=name, latency=time.monotonic() - start)
+                self._record(decision)
+                return response
+            if not pending and backups:
+                # Everything in flight failed: fail over to the next candidate.
+                backup = backups.pop(0)
+                watched = self._submit(backup, prompt, **kwargs)
+                pending[watched] = backup
+                hedge_after = self._hedge_after(backup) if self.hedge and backups else None
+        decision.update(winner=None, errors=errors, latency=time.monotonic() - start)
+        self._record(decision)
+        raise RuntimeError(f"All models failed: {errors}")
+
+    def cascade(self, prompt: str, models: Optional[List[str]] = None,
+                accept: Callable[[Dict[str, Any]], bool] = default_accept, **kwargs) -> Dict[str, Any]:
+        """
+        Cheap-first cascade for short calls such as tool planning: try each model in
+        order (cheapest first) and return the first answer that `accept` approves.
+        If no answer is accepted, the last answer any model produced is returned and
+        the decision is logged with accepted=False.
+        """
+        self._count("requests")
+        start = time.monotonic()
+        models = [m for m in (models or self.cascade_models) if self._healthy(m)] or list(models or self.cascade_models)
+        tried = []
+        response, winner, accepted = None, None, False
+        for i, name in enumerate(models):
+            tried.append(name)
+            if i:
+                self._count("cascade_escalations")
+            try:
+                answer = self._call(name, prompt, **kwargs)
+            except (CircuitOpen, DeadlineExceeded):
+                raise
+            except Exception:
+                continue
+            response, winner = answer, name
+            if accept(answer):
+                accepted = True
+                break
+        if response is not None and not accepted:
+            self._count("cascade_unaccepted")
+        self._record({"mode": "cascade", "tried": tried, "winner": winner, "accepted": accepted,
+                      "latency": time.monotonic() - start})
+        if response is None:
+            raise RuntimeError(f"All cascade models failed: {tried}")
+        return response
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            trackers = dict(self._trackers)
+            counters = dict(self._counters)
+            decisions = list(self._decisions)[-20:]
+        return {
+            "config": {
+                "primary": self.primary,
+                "fallbacks": self.fallbacks,
+                "cascade_models": self.cascade_models,
+                "hedge": self.hedge,
+                "hedge_delay": self.hedge_delay,
+            },
+            "counters": counters,
+            "models": {name: tracker.snapshot() for name, tracker in trackers.items()},
+            "recent_decisions": decisions,
+        }
+
+
+_router: Optional[ModelRouter] = None
+_router_lock = threading.Lock()
+
+
+def get_router() -> ModelRouter:
+    """Return the process-wide router so every caller feeds the same latency stats."""
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = ModelRouter(OpenRouterClient())
+        return _router
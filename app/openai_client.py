@@ -0,0 +1,23 @@
+"""
+The OpenAI client shared by every module that talks to OpenAI.
+
+Each request is capped by the current request deadline and feeds the "openai"
+circuit breaker (see GuardedTransport in app/circuit_breaker.py).
+
+Usage Example:
+    from app.openai_client import client
+    client.files.list(purpose="assistants")
+"""
+import os
+import httpx
+from openai import OpenAI, DefaultHttpxClient, DEFAULT_CONNECTION_LIMITS
+from app.circuit_breaker import GuardedTransport
+
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+# The one vector store memories live in; the assistant's file_search and MemoryStore both use it
+VECTOR_STORE_ID = os.getenv("VECTOR_STORE_ID", "vs_680bc99d6aa481918e5a726356a0281a")
+
+client = OpenAI(
+    api_key=OPENAI_API_KEY,
+    http_client=DefaultHttpxClient(transport=GuardedTransport("openai", httpx.HTTPTransport(limits=DEFAULT_CONNECTION_LIMITS))),
+)
@@ -2,12 +2,18 @@ import os
 import requests
 from typing import Optional, List, Dict, Any
 from dotenv import load_dotenv
+from app.circuit_breaker import admit, record_success, record_failure
+from app.deadline import check, timeout_for
+from app.shared_cache import get_cache, cache_key
+
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", "3600"))
+OPENROUTER_TIMEOUT = float(os.getenv("OPENROUTER_TIMEOUT", "60"))
 
 class OpenRouterClient:
-    def __init__(self, api_key: Optional[str] = None, base_url: str = "https://openrouter.ai/api/v1"):
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None):
         load_dotenv()
         self.api_key = api_key or os.getenv("OPENROUTER_API_KEY")
-        self.base_url = base_url
+        self.base_url = base_url or os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")
         if not self.api_key:
             raise ValueError("OpenRouter API key not found. Set OPENROUTER_API_KEY in your .env file.")
 
@@ -24,6 +30,20 @@ class OpenRouterClient:
             "temperature": temperature
         }
         data.update(kwargs)
-        response = requests.post(url, json=data, headers=headers)
-        response.raise_for_status()
-        return response.json()
+
+        def send():
+            admit("openrouter")
+            try:
+                response = requests.post(url, json=data, headers=headers, timeout=timeout_for(OPENROUTER_TIMEOUT))
+                response.raise_for_status()
+            except Exception as e:
+                record_failure("openrouter", e)
+                check()
+                raise
+            record_success("openrouter")
+            return response.json()
+
+        if temperature == 0:
+            # Deterministic requests are shared across workers through the cache
+            return get_cache().get_or_compute("llm", cache_key(url, data), LLM_CACHE_TTL, send)
+        return send()
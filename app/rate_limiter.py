@@ -0,0 +1,210 @@
+"""
+Process-wide outbound rate limiting for upstream providers.
+
+Each provider (OpenWeatherMap, OpenRouter, OpenAI) gets a token-bucket limiter
+shared by every caller in the process. Waiters are served in priority order, so
+interactive work (chat, /llm/complete) jumps ahead of background work such as
+prefetch, bulk ingest and re-indexing.
+
+Usage Example:
+    from app.rate_limiter import acquire, priority, BACKGROUND
+
+    acquire("openrouter")              # interactive by default
+    with priority(BACKGROUND):
+        acquire("openweathermap")      # yields to interactive callers
+"""
+import os
+import time
+import heapq
+import itertools
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional
+
+INTERACTIVE = 0
+BACKGROUND = 10
+
+_current_priority = contextvars.ContextVar("memir_rate_priority", default=INTERACTIVE)
+
+
+class RateLimitTimeout(Exception):
+    """Raised when a caller gives up waiting for a rate-limit slot."""
+
+
+@contextmanager
+def priority(level: int):
+    """Run the enclosed block at the given scheduling priority (lower runs first)."""
+    token = _current_priority.set(level)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def current_priority() -> int:
+    return _current_priority.get()
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, holding at most `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def time_until(self, amount: float) -> float:
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """
+    Priority-scheduled limiter over one or more token buckets.
+    A request is admitted only when every bucket has a token, so a short-term
+    burst bucket can be combined with a long-term (e.g. daily) quota bucket.
+    Background requests must leave `background_reserve` tokens untouched so
+    interactive traffic never finds the bucket drained by prefetch work.
+    """
+
+    def __init__(self, name: str, buckets: List[TokenBucket], background_reserve: float = 0.0):
+        self.name = name
+        self.buckets = buckets
+        self.background_reserve = background_reserve
+        self._cond = threading.Condition()
+        self._waiting = []
+        self._seq = itertools.count()
+        self._stats = {
+            "acquired": 0,
+            "timeouts": 0,
+            "total_wait": 0.0,
+            "max_wait": 0.0,
+            "max_queue_depth": 0,
+        }
+
+    def _needed(self, level: int) -> float:
+        needed = 1.0 + (self.background_reserve if level >= BACKGROUND else 0.0)
+        # Never ask for more than a bucket can hold, or background work would starve
+        return max(1.0, min([needed] + [bucket.capacity for bucket in self.buckets]))
+
+    def acquire(self, level: Optional[int] = None, timeout: Optional[float] = None) -> float:
+        """
+        Block until a slot is available. Returns the time spent waiting in seconds.
+        Raises RateLimitTimeout if `timeout` elapses first.
+        """
+        level = current_priority() if level is None else level
+        start = time.monotonic()
+        ticket = (level, next(self._seq))
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], len(self._waiting))
+            try:
+                while True:
+                    now = time.monotonic()
+                    for bucket in self.buckets:
+                        bucket.refill(now)
+                    needed = self._needed(level)
+                    if self._waiting[0] == ticket:
+                        delay = max(bucket.time_until(needed) for bucket in self.buckets)
+                        if delay <= 0:
+                            heapq.heappop(self._waiting)
+                            for bucket in self.buckets:
+                                bucket.tokens -= 1.0
+                            waited = now - start
+                            self._stats["acquired"] += 1
+                            self._stats["total_wait"] += waited
+                            self._stats["max_wait"] = max(self._stats["max_wait"], waited)
+                            self._cond.notify_all()
+                            return waited
+                    else:
+                        delay = None
+                    if timeout is not None:
+                        left = timeout - (now - start)
+                        if left <= 0:
+                            self._stats["timeouts"] += 1
+                            raise RateLimitTimeout(f"Timed out waiting for {self.name} rate limit")
+                        delay = left if delay is None else min(delay, left)
+                    self._cond.wait(delay)
+            finally:
+                if ticket in self._waiting:
+                    self._waiting.remove(ticket)
+                    heapq.heapify(self._waiting)
+                    self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            now = time.monotonic()
+            for bucket in self.buckets:
+                bucket.refill(now)
+            acquired = self._stats["acquired"]
+            return {
+                "queue_depth": len(self._waiting),
+                "queued_background": sum(1 for level, _ in self._waiting if level >= BACKGROUND),
+                "tokens_available": min(bucket.tokens for bucket in self.buckets),
+                "acquired": acquired,
+                "timeouts": self._stats["timeouts"],
+                "avg_wait": self._stats["total_wait"] / acquired if acquired else 0.0,
+                "max_wait": self._stats["max_wait"],
+                "max_queue_depth": self._stats["max_queue_depth"],
+            }
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+def _build_limiter(provider: str) -> RateLimiter:
+    """
+    Build a limiter from RATE_LIMIT_<PROVIDER>_PER_SEC / _BURST and, optionally,
+    RATE_LIMIT_<PROVIDER>_DAILY for providers with a hard daily quota.
+    """
+    prefix = f"RATE_LIMIT_{provider.upper()}"
+    rate_default, burst_default, daily_default = PROVIDER_DEFAULTS.get(provider, (5.0, 10.0, 0))
+    # Limits are per process; with N workers (WEB_CONCURRENCY) each gets 1/N of the budget
+    workers = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+    burst = max(1.0, _env_float(f"{prefix}_BURST", burst_default) / workers)
+    buckets = [TokenBucket(_env_float(f"{prefix}_PER_SEC", rate_default) / workers, burst)]
+    daily = _env_float(f"{prefix}_DAILY", daily_default) / workers
+    if daily:
+        buckets.append(TokenBucket(daily / 86400.0, max(1.0, daily)))
+    reserve = _env_float(f"{prefix}_BACKGROUND_RESERVE", max(0.0, burst * 0.2))
+    return RateLimiter(provider, buckets, background_reserve=reserve)
+
+
+# provider -> (requests per second, burst size, daily quota or 0)
+PROVIDER_DEFAULTS = {
+    "openweathermap": (1.0, 10.0, 1000),
+    "openrouter": (5.0, 10.0, 0),
+    "openai": (5.0, 20.0, 0),
+}
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(provider: str) -> RateLimiter:
+    """Return the process-wide limiter for a provider, creating it on first use."""
+    with _limiters_lock:
+        limiter = _limiters.get(provider)
+        if limiter is None:
+            limiter = _limiters[provider] = _build_limiter(provider)
+        return limiter
+
+
+def acquire(provider: str, timeout: Optional[float] = None) -> float:
+    """Wait for a slot on the provider's limiter at the caller's current priority."""
+    return get_limiter(provider).acquire(timeout=timeout)
+
+
+def limiter_stats() -> Dict[str, Dict[str, Any]]:
+    with _limiters_lock:
+        limiters = dict(_limiters)
+    return {name: limiter.stats() for name, limiter in limiters.items()}
@@ -0,0 +1,71 @@
+"""
+Fast JSON responses for large payloads.
+
+dumps() uses orjson when it is installed and falls back to the stdlib encoder
+(compact separators, no ASCII escaping) otherwise. FastJSONResponse renders with
+it; returning one directly from an endpoint also skips FastAPI's jsonable_encoder
+pass over the whole payload. StreamingJSONArray writes `{"key": [item, ...]}`
+incrementally from an iterator, so long lists start flowing to the client while
+later items are still being produced.
+
+Usage Example:
+    return FastJSONResponse(run.to_dict())
+    return StreamingJSONArray("memories", memory_store.iter_memories(filters))
+"""
+import json
+from typing import Any, Iterable, Optional
+
+from fastapi.responses import JSONResponse, StreamingResponse
+
+try:
+    import orjson
+except ImportError:  # optional speed-up
+    orjson = None
+
+
+def _default(obj: Any) -> Any:
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump(mode="json")
+    if hasattr(obj, "to_dict"):
+        return obj.to_dict()
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(obj: Any) -> bytes:
+    """Serialize to compact UTF-8 JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class StreamingJSONArray(StreamingResponse):
+    """
+    Stream `{"<key>": [...]}` from an iterable of JSON-serializable items. Items are
+    encoded one at a time and sent in chunks of roughly `chunk_size` bytes.
+    """
+
+    def __init__(self, key: Optional[str], items: Iterable[Any], chunk_size: int = 16384, **kwargs):
+        kwargs.setdefault("media_type", "application/json")
+        super().__init__(self._encode(key, items, chunk_size), **kwargs)
+
+    @staticmethod
+    def _encode(key: Optional[str], items: Iterable[Any], chunk_size: int):
+        buf = bytearray(b"[" if key is None else b"{" + dumps(key) + b":[")
+        first = True
+        for item in items:
+            if not first:
+                buf += b","
+            buf += dumps(item)
+            first = False
+            if len(buf) >= chunk_size:
+                yield bytes(buf)
+                buf.clear()
+        buf += b"]" if key is None else b"]}"
+        yield bytes(buf)
@@ -0,0 +1,149 @@
+"""
+Cross-worker cache backed by a SQLite file in WAL mode.
+
+Every worker process opens the same file, so a weather lookup, deterministic LLM
+completion or memory search cached by one worker is served to all of them. WAL
+lets readers proceed while a writer commits. Within a process, concurrent misses
+for the same key are collapsed into one upstream call.
+
+Namespaces can be invalidated as a whole with bump(), which is how memory
+searches are dropped after a memory is added or removed.
+
+Usage Example:
+    @cached("weather", ttl=600)
+    def fetch(city): ...
+
+    cache_bump("memory_search")
+"""
+import os
+import json
+import time
+import random
+import sqlite3
+import hashlib
+import tempfile
+import threading
+import functools
+from typing import Any, Optional, Callable
+
+SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH", os.path.join(tempfile.gettempdir(), "memir_shared_cache.sqlite3"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_cache_expires ON cache (expires_at);
+CREATE TABLE IF NOT EXISTS generations (
+    namespace TEXT PRIMARY KEY,
+    generation INTEGER NOT NULL
+);
+"""
+
+_MISSING = object()
+
+
+class SharedCache:
+    def __init__(self, path: str = SHARED_CACHE_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread; SQLite connections are not shared across threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _generation(self, namespace: str) -> int:
+        row = self._conn().execute("SELECT generation FROM generations WHERE namespace = ?", (namespace,)).fetchone()
+        return row[0] if row else 0
+
+    def _key(self, namespace: str, key: str) -> str:
+        return f"{namespace}:{self._generation(namespace)}:{key}"
+
+    def get(self, namespace: str, key: str, default: Any = None) -> Any:
+        row = self._conn().execute(
+            "SELECT value FROM cache WHERE key = ? AND expires_at > ?", (self._key(namespace, key), time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set(self, namespace: str, key: str, value: Any, ttl: float):
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+            (self._key(namespace, key), json.dumps(value), time.time() + ttl),
+        )
+        if random.random() < 0.01:
+            conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+
+    def bump(self, namespace: str):
+        """Invalidate every entry in `namespace` (old entries simply stop matching and expire)."""
+        self._conn().execute(
+            "INSERT INTO generations (namespace, generation) VALUES (?, 1)"
+            " ON CONFLICT(namespace) DO UPDATE SET generation = generation + 1",
+            (namespace,),
+        )
+
+    def get_or_compute(self, namespace: str, key: str, ttl: float, compute: Callable[[], Any],
+                       cache_if: Callable[[Any], bool] = lambda value: value is not None) -> Any:
+        value = self.get(namespace, key, _MISSING)
+        if value is not _MISSING:
+            return value
+        # Single-flight: concurrent misses on the same key in this process wait for one call
+        flight_key = (namespace, key)
+        with self._inflight_lock:
+            lock = self._inflight.setdefault(flight_key, threading.Lock())
+        with lock:
+            value = self.get(namespace, key, _MISSING)
+            if value is not _MISSING:
+                return value
+            try:
+                value = compute()
+                if cache_if(value):
+                    self.set(namespace, key, value, ttl)
+                return value
+            finally:
+                with self._inflight_lock:
+                    self._inflight.pop(flight_key, None)
+
+
+_cache: Optional[SharedCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> SharedCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SharedCache()
+        return _cache
+
+
+def cache_key(*args, **kwargs) -> str:
+    raw = json.dumps([args, kwargs], sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def cache_bump(namespace: str):
+    get_cache().bump(namespace)
+
+
+def cached(namespace: str, ttl: float, skip_self: bool = False):
+    """Cache a function's JSON-serializable result across workers; None results are not cached."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            key_args = args[1:] if skip_self else args
+            key = cache_key(fn.__name__, *key_args, **kwargs)
+            return get_cache().get_or_compute(namespace, key, ttl, lambda: fn(*args, **kwargs))
+        return wrapper
+    return decorator
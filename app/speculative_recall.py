@@ -0,0 +1,127 @@
+"""
+Speculative memory retrieval for the agent loop.
+
+As soon as a user message arrives, a memory search for the raw message is started
+in the background so it overlaps with the first LLM call. If the model then asks
+for search_memory() with a query close to the message, the prefetched hits are
+used instead of a fresh search. Optionally, high-confidence hits can be injected
+into the prompt up front so recall questions skip the search round trip entirely.
+
+Usage Example:
+    recall = SpeculativeRecall(store)
+    recall.start(user_input)          # before the first llm.complete()
+    results = recall.search(query)    # prefetched when the query matches
+    print(recall.stats())
+"""
+import os
+import re
+import time
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Dict, Any
+
+from app.deadline import remaining
+from app.rate_limiter import priority, BACKGROUND
+
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "do", "does", "did", "i", "me", "my", "you", "your",
+    "what", "which", "who", "when", "where", "how", "of", "to", "in", "on", "for", "and", "or", "about",
+    "it", "that", "this", "can", "could", "please", "tell", "know", "remember", "user", "user's", "s",
+}
+
+
+def _terms(text: str) -> set:
+    return {t for t in re.findall(r"[\w']+", text.lower()) if t not in STOPWORDS}
+
+
+class SpeculativeRecall:
+    def __init__(self, store, match_threshold: float = 0.5,
+                 inject_score: Optional[float] = None, inject_wait: float = 2.0):
+        self.store = store
+        self.match_threshold = match_threshold
+        env_score = os.getenv("SPECULATIVE_INJECT_SCORE")
+        self.inject_score = inject_score if inject_score is not None else (float(env_score) if env_score else None)
+        self.inject_wait = inject_wait
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="recall")
+        self._lock = threading.Lock()
+        self._future = None
+        self._message_terms: set = set()
+        self._duration: Optional[float] = None
+        self._counters = {"prefetches": 0, "hits": 0, "misses": 0, "injected": 0, "latency_saved": 0.0}
+
+    def _timed_search(self, query: str):
+        start = time.monotonic()
+        # Speculative work: interactive calls to the same provider go first
+        with priority(BACKGROUND):
+            results = self.store.search_memories(query)
+        self._duration = time.monotonic() - start
+        return results
+
+    def start(self, message: str):
+        """Kick off a background search for the user's message."""
+        with self._lock:
+            self._message_terms = _terms(message)
+            self._duration = None
+            self._future = self._executor.submit(contextvars.copy_context().run, self._timed_search, message)
+            self._counters["prefetches"] += 1
+
+    def invalidate(self):
+        """Drop the prefetch, e.g. after a save_memory changed what a search would return."""
+        with self._lock:
+            self._future = None
+
+    def _matches(self, query: str) -> bool:
+        terms = _terms(query)
+        if not terms or not self._message_terms:
+            return False
+        return len(terms & self._message_terms) / len(terms) >= self.match_threshold
+
+    def _prefetched(self, timeout: Optional[float] = None) -> Optional[List[Dict[str, Any]]]:
+        """The prefetch result, waiting no longer than `timeout` or the current deadline."""
+        future = self._future
+        if future is None:
+            return None
+        left = remaining()
+        if left is not None:
+            timeout = max(0.0, left if timeout is None else min(timeout, left))
+        try:
+            return future.result(timeout=timeout)
+        except Exception:
+            return None
+
+    def search(self, query: str) -> List[Dict[str, Any]]:
+        """Search memories, answering from the prefetch when `query` matches the user's message."""
+        if self._future is not None and self._matches(query):
+            waited_from = time.monotonic()
+            results = self._prefetched()
+            if results is not None:
+                waited = time.monotonic() - waited_from
+                with self._lock:
+                    self._counters["hits"] += 1
+                    self._counters["latency_saved"] += max(0.0, (self._duration or 0.0) - waited)
+                return results
+        with self._lock:
+            self._counters["misses"] += 1
+        return self.store.search_memories(query)
+
+    def injectable(self) -> List[Dict[str, Any]]:
+        """
+        High-confidence prefetched hits (score >= inject_score) to place in the prompt up
+        front. Waits at most `inject_wait` seconds; returns [] when injection is disabled.
+        """
+        if self.inject_score is None:
+            return []
+        results = self._prefetched(timeout=self.inject_wait) or []
+        hits = [r for r in results if (r.get("score") or 0) >= self.inject_score]
+        if hits:
+            with self._lock:
+                self._counters["injected"] += 1
+        return hits
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._counters)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
@@ -1,28 +1,42 @@
 # tool_dispatcher.py
 
 import json
-from app.weather import get_weather
-from app.openrouter_client import OpenRouterClient
+from app.weather import get_weather, get_weather_batch
+from app.weather_projection import parse_current, format_current
+from app.model_router import get_router
+from app.circuit_breaker import CircuitOpen
 
 # Initialize external clients if needed
-llm_client = OpenRouterClient()
+llm_router = get_router()
 
 def handle_get_weather(args):
     city = args["city"]
     country_code = args["country_code"]
     units = args.get("units", "metric")
-    return get_weather(city=city, country_code=country_code, units=units)
+    # Feed the assistant a compact summary instead of the raw payload
+    current = parse_current(get_weather(city=city, country_code=country_code, units=units, city_id=None))
+    if current is None:
+        return f"Weather unavailable for {city},{country_code}."
+    return format_current(current, units=units)
+
+def handle_get_weather_batch(args):
+    units = args.get("units", "metric")
+    batch = get_weather_batch(args["locations"], units=units)
+    lines = [format_current(parse_current(data), units=units) for data in batch["results"].values()]
+    lines += [f"{key}: unavailable ({reason})" for key, reason in batch["errors"].items()]
+    return "\n".join(lines)
 
 def handle_llm_complete(args):
     prompt = args["prompt"]
-    model = args.get("model", "openai/gpt-4.1-nano")
+    model = args.get("model")
     max_tokens = args.get("max_tokens", 1000)
     temperature = args.get("temperature", 0.7)
-    return llm_client.complete(prompt, model=model, max_tokens=max_tokens, temperature=temperature)
+    return llm_router.complete(prompt, model=model, max_tokens=max_tokens, temperature=temperature)
 
 # Central tool dispatcher
 TOOL_DISPATCHER = {
     "get_weather": handle_get_weather,
+    "get_weather_batch": handle_get_weather_batch,
     "llm_complete": handle_llm_complete,
 }
 
@@ -34,6 +48,10 @@ def tool_call_handler(tool_call):
     
     handler = TOOL_DISPATCHER.get(tool_call.function.name)
     if handler:
-        return handler(args)
+        try:
+            return handler(args)
+        except CircuitOpen as e:
+            # Let the assistant tell the user the service is down rather than failing the run
+            return {"error": str(e)}
     else:
         return {"error": f"Unknown tool: {tool_call.function.name}"}
@@ -0,0 +1,346 @@
+"""
+Local exact-search vector store backed by a memory-mapped embedding matrix.
+
+Meant for personal-scale corpora (up to a few hundred thousand memories) where an
+ANN service is overkill. Embeddings are L2-normalized and stored as one contiguous
+float16 or int8-quantized (per-row scale) matrix; search is a vectorized NumPy dot
+product over the memory map, so opening a store is instant and pages are only
+read when searched.
+
+On-disk layout (inside `path`):
+    meta.json               dim, dtype and the current generation
+    vectors.<gen>.bin       rows x dim matrix, appended to in place
+    scales.<gen>.f32        per-row dequantization scale (int8 only)
+    ids.<gen>.jsonl         sidecar log of {"op": "add", "id", "row"} / {"op": "del", "id"}
+
+Writes are append-only: updating or deleting an id tombstones its old row.
+compact() rewrites live rows into a new generation and switches meta.json over
+atomically. Writers in different processes take an flock on `lock` and pick up
+each other's appends; readers reload when the sidecar log or generation changed.
+A write cut short by a crash (partial row, scales shorter than vectors, half a
+log line) is trimmed back to the last complete row on open and before every
+write, so stores already open in other processes never append after it.
+
+This is a standalone library: the service searches the OpenAI vector store, and
+nothing in app/ opens a LocalVectorStore. Callers that delete often should call
+compact_if_needed() themselves, e.g. after a batch of deletes.
+
+Usage Example:
+    from app.embedding import get_openai_embedding
+
+    store = LocalVectorStore("memir_vectors", dim=1536, dtype="int8")
+    store.add("mem-1", get_openai_embedding("Buy almond milk and eggs"))
+    hits = store.search(get_openai_embedding("groceries"), k=3)   # [(id, score), ...]
+"""
+import os
+import json
+import threading
+from contextlib import contextmanager
+from typing import List, Tuple, Sequence, Optional, Dict
+
+import numpy as np
+
+from app.file_lock import file_lock
+
+DTYPES = {"float16": np.float16, "int8": np.int8}
+
+
+class LocalVectorStore:
+    def __init__(self, path: str, dim: int, dtype: str = "float16", chunk_rows: int = 65536):
+        if dtype not in DTYPES:
+            raise ValueError(f"Unsupported dtype {dtype!r}; use one of {sorted(DTYPES)}")
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self._lock = threading.RLock()
+        os.makedirs(path, exist_ok=True)
+        self._lock_path = os.path.join(path, "lock")
+        self.dim = dim
+        self.dtype = dtype
+        self._np_dtype = np.dtype(DTYPES[dtype])
+        self._row_bytes = self._np_dtype.itemsize * dim
+        with file_lock(self._lock_path):
+            meta = self._read_meta()
+            if meta is None:
+                self.generation = 0
+                self._write_meta()
+            else:
+                if meta["dim"] != dim or meta["dtype"] != dtype:
+                    raise ValueError(f"Store at {path} has dim={meta['dim']} dtype={meta['dtype']}")
+                self.generation = meta["generation"]
+            self._repair()
+            self._load()
+
+    # --- files -----------------------------------------------------------
+
+    def _file(self, kind: str, generation: Optional[int] = None) -> str:
+        gen = self.generation if generation is None else generation
+        suffix = {"vectors": "bin", "scales": "f32", "ids": "jsonl"}[kind]
+        return os.path.join(self.path, f"{kind}.{gen}.{suffix}")
+
+    def _read_meta(self) -> Optional[dict]:
+        meta_path = os.path.join(self.path, "meta.json")
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path, "r") as f:
+            return json.load(f)
+
+    def _signature(self):
+        """Changes whenever any process appends to the log or compacts."""
+        stats = []
+        for path in (os.path.join(self.path, "meta.json"), self._file("ids")):
+            try:
+                stat = os.stat(path)
+                stats.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                stats.append(None)
+        return tuple(stats)
+
+    def _complete_rows(self) -> int:
+        vectors = self._file("vectors")
+        rows = os.path.getsize(vectors) // self._row_bytes if os.path.exists(vectors) else 0
+        if self.dtype == "int8":
+            scales = self._file("scales")
+            rows = min(rows, os.path.getsize(scales) // 4 if os.path.exists(scales) else 0)
+        return rows
+
+    def _repair(self) -> bool:
+        """
+        Trim a write cut short by a crash, so later appends line up again. Needs the
+        file lock; returns whether anything was trimmed.
+        """
+        repaired = False
+        rows = self._complete_rows()
+        for kind, width in (("vectors", self._row_bytes), ("scales", 4)):
+            path = self._file(kind)
+            if os.path.exists(path) and os.path.getsize(path) != rows * width:
+                os.truncate(path, rows * width)
+                repaired = True
+        ids = self._file("ids")
+        if os.path.exists(ids):
+            with open(ids, "rb+") as f:
+                end = pos = f.seek(0, os.SEEK_END)
+                # Only the tail is read: walk back to the last complete line
+                while pos > 0:
+                    step = min(4096, pos)
+                    f.seek(pos - step)
+                    block = f.read(step)
+                    if pos == end and block.endswith(b"\n"):
+                        break
+                    newline = block.rfind(b"\n")
+                    if newline >= 0:
+                        f.truncate(pos - step + newline + 1)
+                        repaired = True
+                        break
+                    pos -= step
+                else:
+                    if end:
+                        f.truncate(0)
+                        repaired = True
+        return repaired
+
+    def _sync(self):
+        """Pick up appends or a compaction made by another process."""
+        if self._signature() == self._seen:
+            return
+        meta = self._read_meta()
+        if meta is not None:
+            self.generation = meta["generation"]
+        self._load()
+
+    @contextmanager
+    def _exclusive(self):
+        with self._lock, file_lock(self._lock_path):
+            self._sync()
+            # Another process may have crashed mid-append since we opened the store
+            if self._repair():
+                self._load()
+            yield
+            self._seen = self._signature()
+
+    def _write_meta(self):
+        tmp = os.path.join(self.path, "meta.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump({"dim": self.dim, "dtype": self.dtype, "generation": self.generation}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, os.path.join(self.path, "meta.json"))
+
+    def _load(self):
+        """Map the matrix and replay the sidecar log; vectors themselves stay on disk."""
+        self._seen = self._signature()
+        # Rows whose bytes never fully landed (crash mid-append) are ignored.
+        self.rows = self._complete_rows()
+        self._row_ids: List[Optional[str]] = [None] * self.rows
+        self._index: Dict[str, int] = {}
+        ids = self._file("ids")
+        if os.path.exists(ids):
+            with open(ids, "r") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if entry["op"] == "add" and entry["row"] < self.rows:
+                        self._tombstone(entry["id"])
+                        self._index[entry["id"]] = entry["row"]
+                        self._row_ids[entry["row"]] = entry["id"]
+                    elif entry["op"] == "del":
+                        self._tombstone(entry["id"])
+        self._live = np.array([row_id is not None for row_id in self._row_ids], dtype=bool)
+        self._vectors = None
+        self._scales = None
+
+    def _tombstone(self, item_id: str) -> Optional[int]:
+        row = self._index.pop(item_id, None)
+        if row is not None:
+            self._row_ids[row] = None
+        return row
+
+    def _mapped(self):
+        if self._vectors is None and self.rows:
+            self._vectors = np.memmap(self._file("vectors"), dtype=self._np_dtype, mode="r", shape=(self.rows, self.dim))
+            if self.dtype == "int8":
+                self._scales = np.memmap(self._file("scales"), dtype=np.float32, mode="r", shape=(self.rows,))
+        return self._vectors, self._scales
+
+    # --- writes ----------------------------------------------------------
+
+    def _encode(self, embeddings: np.ndarray):
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        unit = embeddings / np.where(norms == 0, 1.0, norms)
+        if self.dtype == "int8":
+            scales = np.abs(unit).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            quantized = np.rint(unit / scales[:, None]).astype(np.int8)
+            return quantized, scales.astype(np.float32)
+        return unit.astype(np.float16), None
+
+    def add_many(self, ids: Sequence[str], embeddings: Sequence[Sequence[float]]):
+        """Append embeddings; an id that already exists is replaced (old row tombstoned)."""
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        if matrix.ndim != 2 or matrix.shape[1] != self.dim or len(ids) != len(matrix):
+            raise ValueError(f"Expected {len(ids)} embeddings of dimension {self.dim}")
+        encoded, scales = self._encode(matrix)
+        with self._exclusive():
+            start = self.rows
+            with open(self._file("vectors"), "ab") as f:
+                f.write(encoded.tobytes())
+            if scales is not None:
+                with open(self._file("scales"), "ab") as f:
+                    f.write(scales.tobytes())
+            with open(self._file("ids"), "a") as f:
+                for offset, item_id in enumerate(ids):
+                    f.write(json.dumps({"op": "add", "id": item_id, "row": start + offset}) + "\n")
+            self._row_ids.extend(ids)
+            for offset, item_id in enumerate(ids):
+                row = self._tombstone(item_id)
+                if row is not None and row < start:
+                    self._live[row] = False
+                self._index[item_id] = start + offset
+                self._row_ids[start + offset] = item_id
+            fresh = np.array([self._index.get(item_id) == start + offset for offset, item_id in enumerate(ids)], dtype=bool)
+            self._live = np.concatenate([self._live, fresh])
+            self.rows += len(ids)
+            self._vectors = None
+            self._scales = None
+
+    def add(self, item_id: str, embedding: Sequence[float]):
+        self.add_many([item_id], [embedding])
+
+    def delete(self, item_id: str) -> bool:
+        with self._exclusive():
+            if item_id not in self._index:
+                return False
+            with open(self._file("ids"), "a") as f:
+                f.write(json.dumps({"op": "del", "id": item_id}) + "\n")
+            self._live[self._tombstone(item_id)] = False
+            return True
+
+    # --- reads -----------------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, item_id: str) -> bool:
+        return item_id in self._index
+
+    def search(self, query: Sequence[float], k: int = 5, allowed: Optional[Sequence[str]] = None) -> List[Tuple[str, float]]:
+        """
+        Exact cosine top-k over live rows, scanned in chunks so memory use stays bounded.
+        `allowed` restricts the search to the given ids (a pre-filter).
+        """
+        q = np.asarray(query, dtype=np.float32)
+        norm = np.linalg.norm(q)
+        if norm:
+            q = q / norm
+        with self._lock:
+            if self._signature() != self._seen:
+                with file_lock(self._lock_path):
+                    self._sync()
+            vectors, scales = self._mapped()
+            live = self._live
+            if allowed is not None:
+                live = np.zeros_like(live)
+                rows = [self._index[i] for i in allowed if i in self._index]
+                live[rows] = True
+            row_ids = self._row_ids
+            rows = self.rows
+        if not rows or k <= 0:
+            return []
+        best_scores = np.empty(0, dtype=np.float32)
+        best_rows = np.empty(0, dtype=np.int64)
+        for start in range(0, rows, self.chunk_rows):
+            stop = min(rows, start + self.chunk_rows)
+            mask = live[start:stop]
+            if not mask.any():
+                continue
+            scores = vectors[start:stop].astype(np.float32) @ q
+            if scales is not None:
+                scores *= scales[start:stop]
+            scores[~mask] = -np.inf
+            best_scores = np.concatenate([best_scores, scores])
+            best_rows = np.concatenate([best_rows, np.arange(start, stop)])
+            if len(best_scores) > k:
+                keep = np.argpartition(-best_scores, k)[:k]
+                best_scores, best_rows = best_scores[keep], best_rows[keep]
+        order = np.argsort(-best_scores)
+        return [(row_ids[best_rows[i]], float(best_scores[i])) for i in order if np.isfinite(best_scores[i])]
+
+    # --- maintenance -----------------------------------------------------
+
+    def tombstone_ratio(self) -> float:
+        return 1.0 - len(self._index) / self.rows if self.rows else 0.0
+
+    def compact(self) -> Dict[str, int]:
+        """Rewrite live rows into a new generation, dropping tombstoned rows."""
+        with self._exclusive():
+            vectors, scales = self._mapped()
+            live_rows = np.flatnonzero(self._live)
+            before = self.rows
+            old_generation = self.generation
+            new_generation = old_generation + 1
+            with open(self._file("vectors", new_generation), "wb") as f:
+                for start in range(0, len(live_rows), self.chunk_rows):
+                    f.write(np.ascontiguousarray(vectors[live_rows[start:start + self.chunk_rows]]).tobytes())
+            if scales is not None:
+                with open(self._file("scales", new_generation), "wb") as f:
+                    f.write(np.ascontiguousarray(scales[live_rows]).tobytes())
+            with open(self._file("ids", new_generation), "w") as f:
+                for new_row, old_row in enumerate(live_rows):
+                    f.write(json.dumps({"op": "add", "id": self._row_ids[old_row], "row": new_row}) + "\n")
+            self._vectors = None
+            self._scales = None
+            vectors = scales = None
+            self.generation = new_generation
+            self._write_meta()
+            for kind in ("vectors", "scales", "ids"):
+                old = self._file(kind, old_generation)
+                if os.path.exists(old):
+                    os.remove(old)
+            self._load()
+            return {"rows_before": before, "rows_after": self.rows}
+
+    def compact_if_needed(self, max_tombstone_ratio: float = 0.25) -> Optional[Dict[str, int]]:
+        if self.tombstone_ratio() > max_tombstone_ratio:
+            return self.compact()
+        return None
@@ -10,13 +10,27 @@ Usage Example:
         print(f"London, ON: {desc}, {temp}°C")
     else:
         print("Weather data unavailable.")
+
+    # Several cities in one go (group query for IDs, concurrent requests for names):
+    batch = get_weather_batch([6058560, "Paris,FR", "Tokyo"])
+    print(batch["results"].keys(), batch["errors"])
 """
 import os
+import contextvars
 import requests
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Union, List, Dict, Any
 from dotenv import load_dotenv
+from app.circuit_breaker import admit, record_success, record_failure, CircuitOpen
+from app.deadline import check, timeout_for, DeadlineExceeded
+from app.shared_cache import cached
 
 load_dotenv()
 OPENWEATHERMAP_API_KEY = os.getenv("OPENWEATHERMAP_API_KEY")
+# Overridable so tests and load runs can point at a local stand-in server
+OPENWEATHERMAP_BASE_URL = os.getenv("OPENWEATHERMAP_BASE_URL", "https://api.openweathermap.org").rstrip("/")
+# Shared across worker processes (see app/shared_cache.py)
+WEATHER_CACHE_TTL = float(os.getenv("WEATHER_CACHE_TTL", "600"))
 
 # London, Ontario, Canada coordinates (user's precise location)
 HOME_LAT = 42.968004
@@ -32,7 +46,53 @@ def get_weather(city: str = "London", country_code: str = "CA", units: str = "me
     """
     if not OPENWEATHERMAP_API_KEY:
         raise ValueError("OPENWEATHERMAP_API_KEY not set in .env")
-    url = "https://api.openweathermap.org/data/2.5/weather"
+    try:
+        return _fetch_current(city, country_code, units, city_id)
+    except (CircuitOpen, DeadlineExceeded):
+        raise
+    except Exception as e:
+        print(f"Weather API error: {_redact(e)}")
+        return None
+
+
+def _redact(exc: BaseException) -> str:
+    """Exception text for server logs; requests errors embed the full URL, including appid."""
+    text = str(exc)
+    return text.replace(OPENWEATHERMAP_API_KEY, "***") if OPENWEATHERMAP_API_KEY else text
+
+
+def _error_reason(exc: BaseException) -> str:
+    """Short per-item reason that is safe to hand to clients and to the LLM."""
+    if isinstance(exc, (DeadlineExceeded, requests.Timeout)):
+        return "Timed out"
+    if isinstance(exc, CircuitOpen):
+        return "Weather service unavailable"
+    response = getattr(exc, "response", None)
+    if response is not None:
+        return "Not found" if response.status_code == 404 else f"HTTP {response.status_code}"
+    if isinstance(exc, requests.ConnectionError):
+        return "Connection failed"
+    return "Request failed"
+
+
+def _owm_get(url: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """GET an OpenWeatherMap endpoint through the deadline, breaker and rate-limit gate."""
+    admit("openweathermap")
+    try:
+        resp = requests.get(url, params=params, timeout=timeout_for(10))
+        resp.raise_for_status()
+    except Exception as e:
+        record_failure("openweathermap", e)
+        check()
+        raise
+    record_success("openweathermap")
+    return resp.json()
+
+
+@cached("weather", ttl=WEATHER_CACHE_TTL)
+def _fetch_current(city: Optional[str], country_code: Optional[str], units: str, city_id: Optional[int]) -> Dict[str, Any]:
+    """Single /weather request; raises on any error so callers can report the reason."""
+    url = f"{OPENWEATHERMAP_BASE_URL}/data/2.5/weather"
     params = {
         "appid": OPENWEATHERMAP_API_KEY,
         "units": units
@@ -42,15 +102,98 @@ def get_weather(city: str = "London", country_code: str = "CA", units: str = "me
     else:
         q = city if not country_code else f"{city},{country_code}"
         params["q"] = q
-    try:
-        resp = requests.get(url, params=params, timeout=10)
-        resp.raise_for_status()
-        return resp.json()
-    except Exception as e:
-        print(f"Weather API error: {e}")
-        return None
+    return _owm_get(url, params)
+
 
+def _location_key(location: Union[int, str, Dict[str, Any]]) -> str:
+    if isinstance(location, dict):
+        if location.get("city_id"):
+            return str(location["city_id"])
+        city, country = location.get("city"), location.get("country_code")
+        return f"{city},{country}" if country else str(city)
+    return str(location)
 
+
+def _parse_location(location: Union[int, str, Dict[str, Any]]):
+    """Normalize a batch entry into (city, country_code, city_id)."""
+    if isinstance(location, dict):
+        city_id = location.get("city_id")
+        return location.get("city"), location.get("country_code"), int(city_id) if city_id else None
+    if isinstance(location, int) or (isinstance(location, str) and location.strip().isdigit()):
+        return None, None, int(location)
+    city, _, country = str(location).partition(",")
+    return city.strip(), country.strip() or None, None
+
+
+def _fetch_group(city_ids: List[int], units: str) -> Dict[int, Dict[str, Any]]:
+    """One /group request for up to GROUP_LIMIT city IDs; returns entries keyed by city ID."""
+    url = f"{OPENWEATHERMAP_BASE_URL}/data/2.5/group"
+    params = {
+        "appid": OPENWEATHERMAP_API_KEY,
+        "units": units,
+        "id": ",".join(str(i) for i in city_ids)
+    }
+    return {entry["id"]: entry for entry in _owm_get(url, params).get("list", [])}
+
+
+GROUP_LIMIT = 20
+
+
+def get_weather_batch(locations: List[Union[int, str, Dict[str, Any]]], units: str = "metric", max_workers: int = 8) -> Dict[str, Dict[str, Any]]:
+    """
+    Fetch current weather for many locations at once.
+    - Entries may be city IDs (int or digit string), "City" / "City,CC" strings,
+      or dicts with city / country_code / city_id.
+    - City IDs are fetched in chunks of GROUP_LIMIT with the multi-id /group query;
+      names (and IDs whose group call failed) are fetched concurrently.
+    Returns {"results": {key: weather}, "errors": {key: reason}}, keyed by the location as given.
+    """
+    if not OPENWEATHERMAP_API_KEY:
+        raise ValueError("OPENWEATHERMAP_API_KEY not set in .env")
+    results: Dict[str, Dict[str, Any]] = {}
+    errors: Dict[str, str] = {}
+    parsed = {}
+    for location in locations:
+        key = _location_key(location)
+        try:
+            parsed[key] = _parse_location(location)
+        except (TypeError, ValueError) as e:
+            errors[key] = f"Invalid location: {e}"
+
+    by_id = {key: loc[2] for key, loc in parsed.items() if loc[2]}
+    singles = {key: loc for key, loc in parsed.items() if not loc[2]}
+    id_keys = list(by_id)
+    for start in range(0, len(id_keys), GROUP_LIMIT):
+        chunk = id_keys[start:start + GROUP_LIMIT]
+        try:
+            found = _fetch_group([by_id[key] for key in chunk], units)
+        except Exception as e:
+            print(f"Weather group API error, falling back to single requests: {_redact(e)}")
+            singles.update({key: parsed[key] for key in chunk})
+            continue
+        for key in chunk:
+            if by_id[key] in found:
+                results[key] = found[by_id[key]]
+            else:
+                errors[key] = "Not found"
+
+    if singles:
+        # Keep the caller's rate-limit priority inside the worker threads
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(singles))) as pool:
+            futures = {
+                key: pool.submit(contextvars.copy_context().run, _fetch_current, city, country, units, city_id)
+                for key, (city, country, city_id) in singles.items()
+            }
+            for key, future in futures.items():
+                try:
+                    results[key] = future.result()
+                except Exception as e:
+                    print(f"Weather API error for {key}: {_redact(e)}")
+                    errors[key] = _error_reason(e)
+    return {"results": results, "errors": errors}
+
+
+@cached("onecall", ttl=WEATHER_CACHE_TTL)
 def get_onecall_weather(lat: float = HOME_LAT, lon: float = HOME_LON, units: str = "metric", lang: str = "en", exclude: str = None):
     """
     Fetch current, forecast, and alerts using OpenWeatherMap One Call API 3.0.
@@ -58,7 +201,7 @@ def get_onecall_weather(lat: float = HOME_LAT, lon: float = HOME_LON, units: str
     """
     if not OPENWEATHERMAP_API_KEY:
         raise ValueError("OPENWEATHERMAP_API_KEY not set in .env")
-    url = "https://api.openweathermap.org/data/3.0/onecall"
+    url = f"{OPENWEATHERMAP_BASE_URL}/data/3.0/onecall"
     params = {
         "lat": lat,
         "lon": lon,
@@ -69,9 +212,9 @@ def get_onecall_weather(lat: float = HOME_LAT, lon: float = HOME_LON, units: str
     if exclude:
         params["exclude"] = exclude
     try:
-        resp = requests.get(url, params=params, timeout=10)
-        resp.raise_for_status()
-        return resp.json()
+        return _owm_get(url, params)
+    except (CircuitOpen, DeadlineExceeded):
+        raise
     except Exception as e:
-        print(f"One Call API error: {e}")
+        print(f"One Call API error: {_redact(e)}")
         return None
@@ -0,0 +1,196 @@
+"""
+Field projection and compact formatting for OpenWeatherMap payloads.
+
+Callers say which fields they need; the projection derives the One Call `exclude`
+set from that, so unused blocks (e.g. 48 hourly entries) never cross the wire.
+Responses are parsed into small __slots__ records, and one shared formatter turns
+them into token-lean summaries for the LLM.
+
+Usage Example:
+    forecast = get_forecast(fields=("current", "next_hour", "daily"))
+    print(format_forecast(forecast))
+
+    weather = get_weather("London", "GB", city_id=None)
+    print(format_current(parse_current(weather)))
+"""
+from typing import Optional, Dict, Any, Iterable
+
+from app.weather import get_onecall_weather, HOME_LAT, HOME_LON
+
+ONECALL_PARTS = ("current", "minutely", "hourly", "daily", "alerts")
+
+# caller-facing field -> One Call block it is read from
+FIELD_PARTS = {
+    "current": "current",
+    "next_hour": "minutely",
+    "hourly": "hourly",
+    "daily": "daily",
+    "alerts": "alerts",
+}
+
+# What the CLI shows: current conditions, rain in the next hour, two days, alerts
+DEFAULT_FIELDS = ("current", "next_hour", "daily", "alerts")
+
+UNIT_LABELS = {
+    "metric": ("°C", "m/s"),
+    "imperial": ("°F", "mph"),
+    "standard": ("K", "m/s"),
+}
+
+
+def exclude_for(fields: Iterable[str]) -> str:
+    """Return the comma-separated One Call `exclude` value for the requested fields."""
+    needed = set()
+    for field in fields:
+        if field not in FIELD_PARTS:
+            raise ValueError(f"Unknown weather field: {field}")
+        needed.add(FIELD_PARTS[field])
+    return ",".join(part for part in ONECALL_PARTS if part not in needed)
+
+
+class CurrentConditions:
+    __slots__ = ("place", "description", "temp", "feels_like", "humidity", "wind_speed", "wind_deg", "pressure")
+
+    def __init__(self, place=None, description=None, temp=None, feels_like=None,
+                 humidity=None, wind_speed=None, wind_deg=None, pressure=None):
+        self.place = place
+        self.description = description
+        self.temp = temp
+        self.feels_like = feels_like
+        self.humidity = humidity
+        self.wind_speed = wind_speed
+        self.wind_deg = wind_deg
+        self.pressure = pressure
+
+
+class DailyForecast:
+    __slots__ = ("dt", "description", "temp_min", "temp_max", "pop")
+
+    def __init__(self, dt=None, description=None, temp_min=None, temp_max=None, pop=0.0):
+        self.dt = dt
+        self.description = description
+        self.temp_min = temp_min
+        self.temp_max = temp_max
+        self.pop = pop
+
+
+class Alert:
+    __slots__ = ("event", "description")
+
+    def __init__(self, event="Weather Alert", description=""):
+        self.event = event
+        self.description = description
+
+
+class Forecast:
+    __slots__ = ("overview", "current", "next_hour_precip", "daily", "alerts")
+
+    def __init__(self, overview=None, current=None, next_hour_precip=None, daily=None, alerts=None):
+        self.overview = overview
+        self.current = current
+        self.next_hour_precip = next_hour_precip
+        self.daily = daily or []
+        self.alerts = alerts or []
+
+
+def _description(block: Dict[str, Any]) -> Optional[str]:
+    weather = block.get("weather") or [{}]
+    return weather[0].get("description")
+
+
+def parse_current(data: Optional[Dict[str, Any]]) -> Optional[CurrentConditions]:
+    """Parse a /data/2.5/weather response into CurrentConditions."""
+    if not data or "main" not in data:
+        return None
+    main = data["main"]
+    wind = data.get("wind", {})
+    country = data.get("sys", {}).get("country")
+    place = data.get("name")
+    if place and country:
+        place = f"{place}, {country}"
+    return CurrentConditions(
+        place=place,
+        description=_description(data),
+        temp=main.get("temp"),
+        feels_like=main.get("feels_like"),
+        humidity=main.get("humidity"),
+        wind_speed=wind.get("speed"),
+        wind_deg=wind.get("deg"),
+        pressure=main.get("pressure"),
+    )
+
+
+def parse_onecall(data: Optional[Dict[str, Any]], days: int = 2) -> Optional[Forecast]:
+    """Parse a One Call 3.0 response into a Forecast, keeping only `days` daily entries."""
+    if not data:
+        return None
+    current = None
+    cur = data.get("current")
+    if cur:
+        current = CurrentConditions(
+            description=_description(cur),
+            temp=cur.get("temp"),
+            feels_like=cur.get("feels_like"),
+            humidity=cur.get("humidity"),
+            wind_speed=cur.get("wind_speed"),
+            wind_deg=cur.get("wind_deg"),
+            pressure=cur.get("pressure"),
+        )
+    minutely = data.get("minutely")
+    next_hour_precip = any(m.get("precipitation", 0) > 0 for m in minutely) if minutely else None
+    daily = [
+        DailyForecast(
+            dt=d.get("dt"),
+            description=_description(d),
+            temp_min=d.get("temp", {}).get("min"),
+            temp_max=d.get("temp", {}).get("max"),
+            pop=d.get("pop", 0) or 0,
+        )
+        for d in (data.get("daily") or [])[:days]
+    ]
+    alerts = [Alert(a.get("event", "Weather Alert"), a.get("description", "")) for a in data.get("alerts") or []]
+    return Forecast(data.get("weather_overview"), current, next_hour_precip, daily, alerts)
+
+
+def get_forecast(fields: Iterable[str] = DEFAULT_FIELDS, lat: float = HOME_LAT, lon: float = HOME_LON,
+                 units: str = "metric", lang: str = "en", days: int = 2) -> Optional[Forecast]:
+    """Fetch only the One Call blocks needed for `fields` and parse them into a Forecast."""
+    data = get_onecall_weather(lat=lat, lon=lon, units=units, lang=lang, exclude=exclude_for(fields) or None)
+    return parse_onecall(data, days=days)
+
+
+def _num(value, digits: int = 0) -> str:
+    if value is None:
+        return "?"
+    return f"{round(value, digits):g}" if digits else str(int(round(value)))
+
+
+def format_current(cond: CurrentConditions, units: str = "metric") -> str:
+    """One-line summary of current conditions."""
+    deg, speed = UNIT_LABELS.get(units, UNIT_LABELS["metric"])
+    prefix = f"{cond.place}: " if cond.place else ""
+    desc = (cond.description or "n/a").capitalize()
+    return (
+        f"{prefix}{desc}, {_num(cond.temp)}{deg} (feels {_num(cond.feels_like)}{deg}), "
+        f"hum {_num(cond.humidity)}%, wind {_num(cond.wind_speed, 1)} {speed} @{_num(cond.wind_deg)}°, "
+        f"{_num(cond.pressure)} hPa"
+    )
+
+
+def format_forecast(forecast: Forecast, units: str = "metric") -> str:
+    """Compact multi-line summary: overview, current, next hour, daily lines and alerts."""
+    deg, _ = UNIT_LABELS.get(units, UNIT_LABELS["metric"])
+    lines = []
+    if forecast.overview:
+        lines.append(f"Summary: {forecast.overview}")
+    if forecast.current:
+        lines.append(f"Now: {format_current(forecast.current, units)}")
+    if forecast.next_hour_precip is not None:
+        lines.append(f"Next hour: {'precipitation' if forecast.next_hour_precip else 'dry'}")
+    for i, day in enumerate(forecast.daily):
+        label = "Today" if i == 0 else "Tomorrow" if i == 1 else f"Day {i + 1}"
+        desc = (day.description or "n/a").capitalize()
+        lines.append(f"{label}: {desc}, {_num(day.temp_min)}–{_num(day.temp_max)}{deg}, {int(day.pop * 100)}% precip")
+    for alert in forecast.alerts:
+        lines.append(f"ALERT: {alert.event}: {alert.description}")
+    return "\n".join(lines)
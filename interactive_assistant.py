@@ -1,7 +1,13 @@
 from app.memory import MemoryStore
-from app.openrouter_client import OpenRouterClient
+from app.model_router import get_router
+from app.speculative_recall import SpeculativeRecall
+from app.circuit_breaker import CircuitOpen
+from app.deadline import deadline_scope, DeadlineExceeded
+from concurrent.futures import ThreadPoolExecutor
+import os
 import re
 import logging
+import contextvars
 
 # Set up backend logger
 logging.basicConfig(
@@ -12,6 +18,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger("agentic_backend")
 
+# Wall-clock budget for one user turn: every LLM call and tool call in it shares this deadline
+TURN_BUDGET = float(os.getenv("MEMIR_TURN_BUDGET", "60"))
+
 SYSTEM_PROMPT = (
     "You are M.E.M.I.R., an agentic AI assistant with the ability to call real Python functions to interact with user memory. "
     "You must use these functions to recall, store, or manage user information. Do not make up facts—always use the memory functions to check or update information.\n\n"
@@ -29,12 +38,16 @@ SYSTEM_PROMPT = (
     "- Do NOT call the same function repeatedly with the same arguments unless the user clarifies or requests an update.\n"
     "- After calling a weather function and receiving the backend result, respond to the user in plain English using the provided summary.\n"
     "- Only ask for clarification or repeat a function call if the user's request is ambiguous or they specifically ask for more details.\n"
-    "- Output the function call on a single line, e.g.:\n"
+    "- Output each function call on its own line, e.g.:\n"
     "    save_memory(\"The user's favorite color is purple.\")\n"
     "    search_memory(\"favorite color\")\n"
     "    list_memories()\n"
     "    remove_memory(\"123456\")\n"
-    "- You may also use the CALL: prefix, e.g.:\n    CALL: save_memory(\"...\")\n\n"
+    "- You may also use the CALL: prefix, e.g.:\n    CALL: save_memory(\"...\")\n"
+    "- If you need several functions for one request, output them all at once, one call per line and nothing else. "
+    "They run together and you receive every result in a single reply, e.g.:\n"
+    "    get_weather()\n"
+    "    search_memory(\"weekend plans\")\n\n"
     "Examples:\n\n"
     "User: My favorite color is purple.\n"
     "Assistant: save_memory(\"The user's favorite color is purple.\")\n"
@@ -58,32 +71,166 @@ SYSTEM_PROMPT = (
     "- If you are unsure, call a function to check or update memory before answering.\n"
 )
 
+CALL_RE = re.compile(r"^(?:CALL:\s*)?(\w+)\((.*)\)$")
+
+# Calls that change memory run first, in order; everything else runs concurrently afterwards
+MUTATING_CALLS = {"save_memory", "remove_memory"}
+
 def parse_call(text):
     # Accept both 'CALL: function("arg")' and 'function("arg")'
-    text = text.strip()
-    # Try CALL: prefix
-    match = re.match(r"CALL: (\w+)\((.*)\)", text)
-    if match:
-        func = match.group(1)
-        arg = match.group(2)
-        arg = arg.strip()
-        if arg.startswith('"') and arg.endswith('"'):
-            arg = arg[1:-1]
-        return func, arg
-    # Try just function(...)
-    match = re.match(r"(\w+)\((.*)\)", text)
-    if match:
-        func = match.group(1)
-        arg = match.group(2)
-        arg = arg.strip()
-        if arg.startswith('"') and arg.endswith('"'):
-            arg = arg[1:-1]
-        return func, arg
-    return None, None
+    match = CALL_RE.match(text.strip())
+    if not match:
+        return None, None
+    func, arg = match.group(1), match.group(2).strip()
+    if len(arg) >= 2 and arg[0] == arg[-1] and arg[0] in "\"'":
+        arg = arg[1:-1]
+    return func, arg
+
+def parse_calls(text):
+    """
+    Every call in a model reply, in order. A reply may hold several calls, one per
+    line, optionally inside a ``` block or as a bulleted list; other lines are ignored.
+    """
+    calls = []
+    for line in text.splitlines():
+        line = line.strip().lstrip("-*").strip()
+        if not line or line.startswith("```"):
+            continue
+        func, arg = parse_call(line)
+        if func:
+            calls.append((func, arg))
+    return calls
+
+def execute_call(func, arg, store, recall):
+    """Run one function call and return the backend message for the model."""
+    if func == "save_memory":
+        store.add_memory(arg, {"tag": "chat", "test": False})
+        recall.invalidate()
+        return "[Memory saved]"
+    if func == "remove_memory":
+        removed = store.remove_memory(arg)
+        recall.invalidate()
+        return f"[Memory {arg} removed]" if removed else f"[No memory with ID {arg}]"
+    if func == "search_memory":
+        results = recall.search(arg)
+        logger.info(f"search_memory('{arg}') raw results: {results}")
+        context = "\n".join([f"- {hit['document']}" for hit in results])
+        return f"[Memory search results for '{arg}']:\n{context}"
+    if func == "list_memories":
+        memories = store.list_memories()
+        logger.info(f"list_memories raw: {memories}")
+        context = "\n".join([f"- {mem['document']}" for mem in memories])
+        return f"[All memories]:\n{context}"
+    if func == "get_weather":
+        from app.weather import get_weather
+        from app.weather_projection import parse_current, format_current
+        if not arg.strip():
+            weather = get_weather()
+            place = "London, CA"
+        elif ',' in arg:
+            city, country = [x.strip().strip('"\'') for x in arg.split(',', 1)]
+            weather = get_weather(city, country, city_id=None)
+            place = f"{city},{country}"
+        else:
+            place = arg
+            weather = get_weather(arg, city_id=None)
+        current = parse_current(weather)
+        if current:
+            return format_current(current)
+        return f"Sorry, I couldn't retrieve the weather for {place}."
+    if func == "get_weather_forecast":
+        from app.weather_projection import get_forecast, format_forecast
+        forecast = get_forecast()
+        if not forecast:
+            return "Sorry, I couldn't retrieve the forecast for your location."
+        return format_forecast(forecast)
+    return f"[Unknown function: {func}]"
+
+def execute_calls(calls, store, recall, executor):
+    """
+    Run a batch of calls and return their messages in call order. Memory writes run
+    first so reads in the same batch see them; the rest run concurrently.
+    """
+    results = {}
+    for i, (func, arg) in enumerate(calls):
+        if func in MUTATING_CALLS:
+            results[i] = _safe_execute(func, arg, store, recall)
+    futures = {
+        i: executor.submit(contextvars.copy_context().run, _safe_execute, func, arg, store, recall)
+        for i, (func, arg) in enumerate(calls) if i not in results
+    }
+    for i, future in futures.items():
+        results[i] = future.result()
+    return [results[i] for i in range(len(calls))]
+
+def _safe_execute(func, arg, store, recall):
+    try:
+        message = execute_call(func, arg, store, recall)
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        # One failing tool should not sink the others in the batch
+        logger.warning(f"{func}({arg}) failed: {e}")
+        message = f"[{func} failed: {e}]"
+    logger.info(f"{func}({arg}) result: {message}")
+    return message
+
+def ask(llm, conversation):
+    prompt = SYSTEM_PROMPT + "\n" + "\n".join(conversation) + "\nAssistant:"
+    response = llm.complete(prompt)
+    if isinstance(response, dict) and 'choices' in response:
+        return response['choices'][0]['message']['content'].strip()
+    return str(response).strip()
+
+def run_turn(llm, conversation, store, recall, executor, max_steps=8):
+    """
+    Drive one user turn: ask the model, run every call it requested as one batch,
+    hand all results back in a single follow-up, repeat until it answers in prose.
+    """
+    done_calls = {}
+    repeats = 0
+    unique_search_queries = set()
+    for _ in range(max_steps):
+        print("\nThinking...")
+        answer = ask(llm, conversation)
+        calls = parse_calls(answer)
+        if not calls:
+            print(f"Assistant: {answer}\n")
+            conversation.append(f"Assistant: {answer}")
+            return
+        logger.info(f"Function calls: {calls}")
+        new_calls = [call for call in dict.fromkeys(calls) if call not in done_calls]
+        if not new_calls:
+            repeats += 1
+            if repeats >= 2:
+                print(f"[Aborted: Repeated function calls {calls}.]")
+                logger.warning(f"Aborted: Repeated function calls {calls}.")
+                return
+        unique_search_queries.update(arg for func, arg in new_calls if func == "search_memory")
+        if len(unique_search_queries) > 3:
+            print("[Aborted: Too many unique search attempts. Responding: 'I don’t know'.]")
+            logger.warning("Aborted: Too many unique search attempts. Responding: 'I don’t know'.")
+            conversation.append("Assistant: I don’t know. I couldn’t find that information. Would you like to tell me?")
+            print("Assistant: I don’t know. I couldn’t find that information. Would you like to tell me?\n")
+            return
+        for call, message in zip(new_calls, execute_calls(new_calls, store, recall, executor)):
+            done_calls[call] = message
+        # All results go back in one follow-up message; repeats get a reminder instead of a re-run
+        lines = []
+        for func, arg in dict.fromkeys(calls):
+            message = done_calls[(func, arg)]
+            if (func, arg) not in new_calls:
+                message = "You already received this result. Only request again if you want an update or different details."
+            lines.append(f"{func}({arg}) ->\n{message}")
+        conversation.append("Assistant: " + "\n\n".join(lines))
+    print("[Aborted: Too many steps for one request.]")
+    logger.warning(f"Aborted: turn exceeded {max_steps} steps.")
 
 if __name__ == "__main__":
     store = MemoryStore()
-    llm = OpenRouterClient()
+    recall = SpeculativeRecall(store)
+    llm = get_router()
+    executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="tool")
 
     conversation = []
     print("Welcome to M.E.M.I.R. Agentic CLI!")
@@ -92,286 +239,22 @@ if __name__ == "__main__":
     while True:
         user_input = input("You: ").strip()
         if user_input.lower() in {"exit", "quit"}:
+            logger.info(f"Speculative recall stats: {recall.stats()}")
             print("Goodbye!")
             break
 
         conversation.append(f"User: {user_input}")
-        max_loops = 8
-        loop_count = 0
-        last_func_call = None
-        repeat_func_count = 0
-        unique_search_queries = set()
-        while True:
-            if loop_count > max_loops:
-                # If the LLM output is a function call, handle it and continue processing until a plain English response is intended.
-                while True:
-                    answer = llm.complete(SYSTEM_PROMPT + "\n" + "\n".join(conversation) + "\nAssistant:")
-                    answer = answer.strip()
-                    # Function call pattern
-                    match = re.match(r'(?:CALL: )?(\w+)\((.*)\)', answer)
-                    if match:
-                        func, arg = match.group(1), match.group(2)
-                        logger.info(f"Function call: {func}({arg})")
-                        if func == "save_memory":
-                            store.add_memory(arg, {"tag": "chat", "test": False})
-                            backend_message = "[Memory saved]"
-                            logger.info(f"DEBUG: save_memory called with arg={arg}")
-                        elif func == "search_memory":
-                            results = store.search_memories(arg)
-                            logger.info(f"DEBUG: search_memory('{arg}') raw results: {results}")
-                            context = "\n".join([f"- {hit['document']}" for hit in results])
-                            backend_message = f"[Memory search results for '{arg}']:\n{context}"
-                            print(f"DEBUG: search_memory('{arg}') backend_message: {backend_message}")
-                        elif func == "list_memories":
-                            memories = store.list_memories()
-                            logger.info(f"DEBUG: list_memories raw: {memories}")
-                            context = "\n".join([f"- {mem['document']}" for mem in memories])
-                            backend_message = f"[All memories]:\n{context}"
-                            print(f"DEBUG: list_memories backend_message: {backend_message}")
-                        elif func == "get_weather":
-                            from app.weather import get_weather
-                            if not arg.strip():
-                                weather = get_weather()
-                                city = weather.get('name', 'London')
-                                country = weather.get('sys', {}).get('country', 'CA')
-                            elif ',' in arg:
-                                city, country = [x.strip() for x in arg.split(',', 1)]
-                                weather = get_weather(city, country, city_id=None)
-                            else:
-                                city = arg
-                                country = None
-                                weather = get_weather(city, city_id=None)
-                            if weather and 'weather' in weather and 'main' in weather:
-                                desc = weather['weather'][0]['description'].capitalize()
-                                temp = weather['main']['temp']
-                                feels = weather['main'].get('feels_like', temp)
-                                humidity = weather['main'].get('humidity', '?')
-                                wind = weather.get('wind', {}).get('speed', '?')
-                                wind_deg = weather.get('wind', {}).get('deg', '?')
-                                pressure = weather['main'].get('pressure', '?')
-                                summary = (
-                                    f"Current weather for {city}, {country}:\n"
-                                    f"- Condition: {desc}\n"
-                                    f"- Temperature: {temp}°C (feels like {feels}°C)\n"
-                                    f"- Humidity: {humidity}%\n"
-                                    f"- Wind: {wind} m/s at {wind_deg}°\n"
-                                    f"- Pressure: {pressure} hPa"
-                                )
-                                backend_message = summary
-                            else:
-                                backend_message = f"Sorry, I couldn't retrieve the weather for {city}{','+country if country else ''}."
-                            logger.info(f"DEBUG: get_weather('{arg}') result: {backend_message}")
-                            print(f"DEBUG: get_weather('{arg}') backend_message: {backend_message}")
-                            # Output directly as assistant's reply
-                            conversation.append(f"Assistant: {backend_message}")
-                            continue
-                        elif func == "get_weather_forecast":
-                            from app.weather import get_onecall_weather
-                            # Prevent repeated identical calls unless context changes
-                            if (
-                                hasattr(self, 'last_weather_call') and
-                                self.last_weather_call == (func, None)
-                            ):
-                                backend_message = "You just received the latest forecast. Only request again if you want an update or different details."
-                                logger.warning(f"Repeated function call '{func}()' with same context.")
-                                conversation.append(f"Assistant: {backend_message}")
-                                break
-                            data = get_onecall_weather()
-                            if not data:
-                                backend_message = "Sorry, I couldn't retrieve the forecast for your location."
-                            else:
-                                lines = []
-                                if 'weather_overview' in data:
-                                    lines.append(f"Summary: {data['weather_overview']}")
-                                cur = data.get('current', {})
-                                if cur:
-                                    desc = cur.get('weather', [{}])[0].get('description', 'N/A').capitalize()
-                                    temp = cur.get('temp', '?')
-                                    feels = cur.get('feels_like', temp)
-                                    humidity = cur.get('humidity', '?')
-                                    wind = cur.get('wind_speed', '?')
-                                    wind_deg = cur.get('wind_deg', '?')
-                                    pressure = cur.get('pressure', '?')
-                                    lines.append(f"Current: {desc}, {temp}°C (feels like {feels}°C), humidity {humidity}%, wind {wind} m/s at {wind_deg}°, pressure {pressure} hPa.")
-                                minutely = data.get('minutely', [])
-                                if minutely:
-                                    precip = any(m.get('precipitation', 0) > 0 for m in minutely)
-                                    lines.append(f"Next hour: {'Precipitation expected' if precip else 'No precipitation expected'}.")
-                                daily = data.get('daily', [])
-                                from datetime import datetime
-                                if daily:
-                                    for i, d in enumerate(daily[:2]):
-                                        day = 'Today' if i == 0 else 'Tomorrow'
-                                        desc = d.get('weather', [{}])[0].get('description', 'N/A').capitalize()
-                                        tmin = d.get('temp', {}).get('min', '?')
-                                        tmax = d.get('temp', {}).get('max', '?')
-                                        pop = d.get('pop', 0)
-                                        lines.append(f"{day}: {desc}, {tmin}–{tmax}°C, {int(pop*100)}% chance of precipitation.")
-                                alerts = data.get('alerts', [])
-                                if alerts:
-                                    for alert in alerts:
-                                        lines.append(f"ALERT: {alert.get('event', 'Weather Alert')}: {alert.get('description', '')}")
-                                backend_message = "\n".join(lines)
-                            logger.info(f"DEBUG: get_weather_forecast result: {backend_message}")
-                            print(f"DEBUG: get_weather_forecast backend_message: {backend_message}")
-                            conversation.append(f"Assistant: {backend_message}")
-                            # Track last weather call context
-                            self.last_weather_call = (func, None)
-                            continue
-
-                        # Append backend result as next Assistant message
-                        conversation.append(f"Assistant: {backend_message}")
-                        # Call LLM again for next step (may be another function call)
-                        prompt2 = SYSTEM_PROMPT + "\n" + "\n".join(conversation) + "\nAssistant:"
-                        answer = llm.complete(prompt2)
-                        continue
-                    else:
-                        # Not a function call, treat as plain English answer and break
-                        print(f"Assistant: {answer}\n")
-                        break
-                break
-            loop_count += 1
-            print("\nThinking...")
-            prompt = SYSTEM_PROMPT + "\n" + "\n".join(conversation) + "\nAssistant:"
-            response = llm.complete(prompt)
-            if isinstance(response, dict) and 'choices' in response:
-                answer = response['choices'][0]['message']['content']
-            else:
-                answer = str(response)
-            answer = answer.strip()
-            if answer.startswith("CALL:") or re.match(r"^\w+\(.*\)$", answer):
-                func, arg = parse_call(answer)
-                logger.info(f"Function call: {func}({arg})")
-                # Detect repeated function calls
-                func_call_tuple = (func, arg)
-                if func_call_tuple == last_func_call:
-                    repeat_func_count += 1
-                    if repeat_func_count >= 2:
-                        print(f"[Aborted: Repeated function call '{func}({arg})'.]")
-                        logger.warning(f"Aborted: Repeated function call '{func}({arg})'.")
-                        break
-                else:
-                    repeat_func_count = 0
-                last_func_call = func_call_tuple
-                # Track unique search_memory queries
-                if func == "search_memory":
-                    if arg in unique_search_queries:
-                        logger.info(f"Duplicate search_memory query: '{arg}'")
-                    unique_search_queries.add(arg)
-                    if len(unique_search_queries) > 3:
-                        print("[Aborted: Too many unique search attempts. Responding: 'I don’t know'.]")
-                        logger.warning("Aborted: Too many unique search attempts. Responding: 'I don’t know'.")
-                        conversation.append("Assistant: I don’t know. I couldn’t find that information. Would you like to tell me?")
-                        print("Assistant: I don’t know. I couldn’t find that information. Would you like to tell me?\n")
-                        break
-                backend_message = None
-                if func == "save_memory":
-                    store.add_memory(arg, {"tag": "chat", "test": False})
-                    backend_message = "[Memory saved]"
-                    logger.info(f"DEBUG: save_memory called with arg={arg}")
-                elif func == "search_memory":
-                    results = store.search_memories(arg)
-                    logger.info(f"DEBUG: search_memory('{arg}') raw results: {results}")
-                    context = "\n".join([f"- {hit['document']}" for hit in results])
-                    backend_message = f"[Memory search results for '{arg}']:\n{context}"
-                    print(f"DEBUG: search_memory('{arg}') backend_message: {backend_message}")
-                elif func == "list_memories":
-                    memories = store.list_memories()
-                    logger.info(f"DEBUG: list_memories raw: {memories}")
-                    context = "\n".join([f"- {mem['document']}" for mem in memories])
-                    backend_message = f"[All memories]:\n{context}"
-                    print(f"DEBUG: list_memories backend_message: {backend_message}")
-                elif func == "get_weather":
-                    from app.weather import get_weather
-                    if not arg.strip():
-                        weather = get_weather()
-                        city = weather.get('name', 'London')
-                        country = weather.get('sys', {}).get('country', 'CA')
-                    elif ',' in arg:
-                        city, country = [x.strip() for x in arg.split(',', 1)]
-                        weather = get_weather(city, country, city_id=None)
-                    else:
-                        city = arg
-                        country = None
-                        weather = get_weather(city, city_id=None)
-                    if weather and 'weather' in weather and 'main' in weather:
-                        desc = weather['weather'][0]['description'].capitalize()
-                        temp = weather['main']['temp']
-                        feels = weather['main'].get('feels_like', temp)
-                        humidity = weather['main'].get('humidity', '?')
-                        wind = weather.get('wind', {}).get('speed', '?')
-                        wind_deg = weather.get('wind', {}).get('deg', '?')
-                        pressure = weather['main'].get('pressure', '?')
-                        summary = (
-                            f"Current weather for {city}, {country}:\n"
-                            f"- Condition: {desc}\n"
-                            f"- Temperature: {temp}°C (feels like {feels}°C)\n"
-                            f"- Humidity: {humidity}%\n"
-                            f"- Wind: {wind} m/s at {wind_deg}°\n"
-                            f"- Pressure: {pressure} hPa"
-                        )
-                        backend_message = summary
-                    else:
-                        backend_message = f"Sorry, I couldn't retrieve the weather for {city}{','+country if country else ''}."
-                    logger.info(f"DEBUG: get_weather('{arg}') result: {backend_message}")
-                    print(f"DEBUG: get_weather('{arg}') backend_message: {backend_message}")
-                    # Output directly as assistant's reply
-                    conversation.append(f"Assistant: {backend_message}")
-                    continue
-                elif func == "get_weather_forecast":
-                    from app.weather import get_onecall_weather
-                    # Prevent repeated identical calls unless context changes
-                    if (
-                        hasattr(self, 'last_weather_call') and
-                        self.last_weather_call == (func, None)
-                    ):
-                        backend_message = "You just received the latest forecast. Only request again if you want an update or different details."
-                        logger.warning(f"Repeated function call '{func}()' with same context.")
-                        conversation.append(f"Assistant: {backend_message}")
-                        continue
-                    data = get_onecall_weather()
-                    if not data:
-                        backend_message = "Sorry, I couldn't retrieve the forecast for your location."
-                    else:
-                        lines = []
-                        if 'weather_overview' in data:
-                            lines.append(f"Summary: {data['weather_overview']}")
-                        cur = data.get('current', {})
-                        if cur:
-                            desc = cur.get('weather', [{}])[0].get('description', 'N/A').capitalize()
-                            temp = cur.get('temp', '?')
-                            feels = cur.get('feels_like', temp)
-                            humidity = cur.get('humidity', '?')
-                            wind = cur.get('wind_speed', '?')
-                            wind_deg = cur.get('wind_deg', '?')
-                            pressure = cur.get('pressure', '?')
-                            lines.append(f"Current: {desc}, {temp}°C (feels like {feels}°C), humidity {humidity}%, wind {wind} m/s at {wind_deg}°, pressure {pressure} hPa.")
-                        minutely = data.get('minutely', [])
-                        if minutely:
-                            precip = any(m.get('precipitation', 0) > 0 for m in minutely)
-                            lines.append(f"Next hour: {'Precipitation expected' if precip else 'No precipitation expected'}.")
-                        daily = data.get('daily', [])
-                        from datetime import datetime
-                        if daily:
-                            for i, d in enumerate(daily[:2]):
-                                day = 'Today' if i == 0 else 'Tomorrow'
-                                desc = d.get('weather', [{}])[0].get('description', 'N/A').capitalize()
-                                tmin = d.get('temp', {}).get('min', '?')
-                                tmax = d.get('temp', {}).get('max', '?')
-                                pop = d.get('pop', 0)
-                                lines.append(f"{day}: {desc}, {tmin}–{tmax}°C, {int(pop*100)}% chance of precipitation.")
-                        alerts = data.get('alerts', [])
-                        if alerts:
-                            for alert in alerts:
-                                lines.append(f"ALERT: {alert.get('event', 'Weather Alert')}: {alert.get('description', '')}")
-                        backend_message = "\n".join(lines)
-                    logger.info(f"DEBUG: get_weather_forecast result: {backend_message}")
-                    print(f"DEBUG: get_weather_forecast backend_message: {backend_message}")
-                    conversation.append(f"Assistant: {backend_message}")
-                    # Track last weather call context
-                    self.last_weather_call = (func, None)
-                    continue
-
-            else:
-                print(f"Assistant: {answer}\n")
-                break
+        try:
+            with deadline_scope(TURN_BUDGET):
+                # Start a memory search for the message now; it runs while the first LLM call is in flight
+                recall.start(user_input)
+                injected = recall.injectable()
+                if injected:
+                    context = "\n".join([f"- {hit['document']}" for hit in injected])
+                    conversation.append(f"Assistant: [Memory search results for '{user_input}']:\n{context}")
+                    logger.info(f"Injected {len(injected)} prefetched memories up front")
+                run_turn(llm, conversation, store, recall, executor)
+        except (DeadlineExceeded, CircuitOpen) as e:
+            # Out of time for this turn, or a dependency is down: say so instead of hanging
+            logger.warning(f"Turn aborted: {e}")
+            print(f"[Aborted: {e}]\n")
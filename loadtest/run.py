@@ -0,0 +1,199 @@
+"""
+Concurrent load test for the FastAPI backend against local upstream stubs.
+
+Starts the stub servers (loadtest/stubs.py), boots the app under uvicorn with every
+upstream base URL pointed at them, then drives a weighted mix of /weather,
+/llm/complete, /thread/*/run, /thread/*/messages and /memory/* traffic at each
+concurrency stage. Prints throughput and p50/p95/p99 latency per route per stage.
+
+Usage:
+    python -m loadtest.run --stages 1,8,32 --duration 10
+    python -m loadtest.run --openrouter-latency 0.8 --openrouter-error-rate 0.1 --fail-p95 2.0
+    python -m loadtest.run --workers 4 --json results.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple, Optional
+
+from loadtest.stubs import start_stub_server, add_stub_arguments, config_from_args
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (label, weight, method, path template, json body)
+TRAFFIC_MIX = [
+    ("GET /weather", 30, "GET", "/weather?city=London&country_code=CA", None),
+    ("POST /llm/complete", 20, "POST", "/llm/complete", {"prompt": "Say hi", "max_tokens": 20}),
+    ("POST /thread/{id}/run", 10, "POST", "/thread/{thread_id}/run", None),
+    ("GET /thread/{id}/messages", 10, "GET", "/thread/{thread_id}/messages", None),
+    ("POST /memory/upload", 5, "POST", "/memory/upload", "load test memory"),
+    ("GET /memory/list", 10, "GET", "/memory/list", None),
+    ("GET /memory/search", 15, "GET", "/memory/search?q=favorite+color", None),
+]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+def _request(base: str, method: str, path: str, body) -> int:
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    req = urllib.request.Request(base + path, data=data, method=method,
+                                 headers={"Content-Type": "application/json"} if data else {})
+    try:
+        with urllib.request.urlopen(req, timeout=60) as resp:
+            resp.read()
+            return resp.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except Exception:
+        return 0
+
+
+def app_environment(stub_base: str, workdir: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update({
+        "OPENAI_API_KEY": "stub", "OPENAI_BASE_URL": f"{stub_base}/openai/v1",
+        "OPENROUTER_API_KEY": "stub", "OPENROUTER_BASE_URL": f"{stub_base}/openrouter/api/v1",
+        "OPENWEATHERMAP_API_KEY": "stub", "OPENWEATHERMAP_BASE_URL": f"{stub_base}/owm",
+        "VECTOR_STORE_ID": "vs_stub",
+        "ASSISTANT_ID_PATH": os.path.join(workdir, "assistant_id.txt"),
+        "MEMORY_INDEX_PATH": os.path.join(workdir, "memory_index.sqlite3"),
+        "SHARED_CACHE_PATH": os.path.join(workdir, "shared_cache.sqlite3"),
+    })
+    # Measure the service, not our own outbound throttling
+    for provider in ("OPENAI", "OPENROUTER", "OPENWEATHERMAP"):
+        env[f"RATE_LIMIT_{provider}_PER_SEC"] = "100000"
+        env[f"RATE_LIMIT_{provider}_BURST"] = "100000"
+        env[f"RATE_LIMIT_{provider}_DAILY"] = "0"
+    return env
+
+
+def start_app(port: int, env: Dict[str, str], workers: int) -> subprocess.Popen:
+    cmd = [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+           "--workers", str(workers), "--log-level", "warning"]
+    proc = subprocess.Popen(cmd, cwd=REPO_ROOT, env={**env, "WEB_CONCURRENCY": str(workers)})
+    base = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError("App exited during startup")
+        if _request(base, "GET", "/", None) == 200:
+            return proc
+        time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("App did not become ready within 30s")
+
+
+def run_stage(base: str, concurrency: int, duration: float, thread_id: str) -> Dict[str, List[Tuple[float, int]]]:
+    labels = [m[0] for m in TRAFFIC_MIX]
+    weights = [m[1] for m in TRAFFIC_MIX]
+    samples: Dict[str, List[Tuple[float, int]]] = {label: [] for label in labels}
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def worker(seed: int):
+        rng = random.Random(seed)
+        while time.monotonic() < stop_at:
+            label, _, method, path, body = rng.choices(TRAFFIC_MIX, weights=weights)[0]
+            start = time.monotonic()
+            status = _request(base, method, path.format(thread_id=thread_id), body)
+            elapsed = time.monotonic() - start
+            with lock:
+                samples[label].append((elapsed, status))
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for i in range(concurrency):
+            pool.submit(worker, i)
+    return samples
+
+
+def summarize(samples: Dict[str, List[Tuple[float, int]]], duration: float) -> Dict[str, Dict[str, float]]:
+    summary = {}
+    for label, values in samples.items():
+        latencies = [latency for latency, _ in values]
+        summary[label] = {
+            "requests": len(values),
+            "errors": sum(1 for _, status in values if not 200 <= status < 300),
+            "rps": len(values) / duration,
+            "p50": _percentile(latencies, 50),
+            "p95": _percentile(latencies, 95),
+            "p99": _percentile(latencies, 99),
+        }
+    return summary
+
+
+def print_summary(concurrency: int, summary: Dict[str, Dict[str, float]]):
+    print(f"\n=== concurrency {concurrency} ===")
+    print(f"{'route':<30}{'reqs':>7}{'errs':>6}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for label, s in summary.items():
+        print(f"{label:<30}{s['requests']:>7}{s['errors']:>6}{s['rps']:>9.1f}"
+              f"{s['p50'] * 1000:>9.0f}{s['p95'] * 1000:>9.0f}{s['p99'] * 1000:>9.0f}")
+    total = sum(s["rps"] for s in summary.values())
+    print(f"{'total':<30}{'':>13}{total:>9.1f}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load test the Memir backend against local stubs")
+    parser.add_argument("--stages", default="1,4,16,32", help="Comma-separated concurrency levels")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per stage")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--json", help="Write per-stage results to this file")
+    parser.add_argument("--fail-p95", type=float, help="Exit non-zero if any route's p95 (s) exceeds this")
+    add_stub_arguments(parser)
+    args = parser.parse_args(argv)
+
+    stubs = start_stub_server(0, config_from_args(args))
+    stub_base = f"http://127.0.0.1:{stubs.server_address[1]}"
+    workdir = tempfile.mkdtemp(prefix="memir_loadtest_")
+    port = _free_port()
+    app = start_app(port, app_environment(stub_base, workdir), args.workers)
+    base = f"http://127.0.0.1:{port}"
+    results = {}
+    failed = False
+    try:
+        req = urllib.request.Request(base + "/thread/create", data=b"", method="POST")
+        with urllib.request.urlopen(req, timeout=30) as resp:
+            thread_id = json.loads(resp.read())["thread_id"]
+        for concurrency in [int(c) for c in args.stages.split(",") if c.strip()]:
+            summary = summarize(run_stage(base, concurrency, args.duration, thread_id), args.duration)
+            print_summary(concurrency, summary)
+            results[concurrency] = summary
+            if args.fail_p95 is not None:
+                slow = [label for label, s in summary.items() if s["p95"] > args.fail_p95]
+                if slow:
+                    print(f"p95 above {args.fail_p95}s at concurrency {concurrency}: {', '.join(slow)}")
+                    failed = True
+    finally:
+        app.terminate()
+        app.wait(timeout=10)
+        stubs.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,289 @@
+"""
+Local stand-in servers for OpenAI, OpenRouter and OpenWeatherMap.
+
+One threaded HTTP server answers all three providers under separate path
+prefixes, returning just enough of each API's JSON shape for the backend to work:
+
+    /openai/v1/...          assistants, threads, runs, files, vector stores, responses
+    /openrouter/api/v1/...  chat completions
+    /owm/data/...           current weather, group, One Call
+
+Each provider has its own latency (mean + uniform jitter) and error rate, so load
+runs can model a slow or flaky dependency.
+
+Run standalone:
+    python -m loadtest.stubs --port 8900 --openai-latency 0.2 --openrouter-error-rate 0.05
+"""
+import re
+import json
+import time
+import random
+import argparse
+import itertools
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, Tuple
+
+PROVIDERS = ("openai", "openrouter", "owm")
+
+
+class StubConfig:
+    def __init__(self, latency: Dict[str, float] = None, jitter: Dict[str, float] = None,
+                 error_rate: Dict[str, float] = None):
+        self.latency = {p: 0.0 for p in PROVIDERS}
+        self.jitter = {p: 0.0 for p in PROVIDERS}
+        self.error_rate = {p: 0.0 for p in PROVIDERS}
+        self.latency.update(latency or {})
+        self.jitter.update(jitter or {})
+        self.error_rate.update(error_rate or {})
+
+
+class _State:
+    """In-memory objects the OpenAI stub hands out (runs need to change status)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.runs: Dict[str, Dict] = {}
+        self.messages: Dict[str, list] = {}
+        self.files: Dict[str, Dict] = {}
+
+    def new_id(self, prefix: str) -> str:
+        return f"{prefix}_{next(self.ids)}"
+
+
+def _weather(city_id: int = 6058560, name: str = "London") -> Dict:
+    return {
+        "id": city_id, "name": name, "sys": {"country": "CA"},
+        "weather": [{"description": "scattered clouds"}],
+        "main": {"temp": 12.3, "feels_like": 11.1, "humidity": 71, "pressure": 1014},
+        "wind": {"speed": 4.2, "deg": 250},
+    }
+
+
+def _onecall() -> Dict:
+    now = int(time.time())
+    return {
+        "current": {"temp": 12.3, "feels_like": 11.1, "humidity": 71, "pressure": 1014, "wind_speed": 4.2,
+                    "wind_deg": 250, "weather": [{"description": "scattered clouds"}]},
+        "minutely": [{"dt": now + 60 * i, "precipitation": 0} for i in range(61)],
+        "hourly": [{"dt": now + 3600 * i, "temp": 12.0, "pop": 0.1} for i in range(48)],
+        "daily": [{"dt": now + 86400 * i, "temp": {"min": 6.0, "max": 15.0}, "pop": 0.2,
+                   "weather": [{"description": "light rain"}]} for i in range(8)],
+    }
+
+
+def make_handler(config: StubConfig, state: _State):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status: int, body: Dict):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _body(self) -> Dict:
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length) if length else b""
+            if self.headers.get("Content-Type", "").startswith("application/json") and raw:
+                return json.loads(raw)
+            # Multipart file uploads: keep just the filename, like the real API does
+            match = re.search(rb'filename="([^"]+)"', raw)
+            return {"filename": match.group(1).decode("utf-8")} if match else {}
+
+        def _handle(self, method: str):
+            provider, _, path = self.path.lstrip("/").partition("/")
+            path = "/" + path.split("?", 1)[0]
+            body = self._body() if method == "POST" else {}
+            if provider not in PROVIDERS:
+                return self._send(404, {"error": "unknown provider"})
+            delay = config.latency[provider] + random.uniform(0, config.jitter[provider])
+            if delay:
+                time.sleep(delay)
+            if random.random() < config.error_rate[provider]:
+                return self._send(503, {"error": {"message": "stub injected failure"}})
+            route = {"openai": self._openai, "openrouter": self._openrouter, "owm": self._owm}[provider]
+            status, payload = route(method, path, body)
+            self._send(status, payload)
+
+        def do_GET(self):
+            self._handle("GET")
+
+        def do_POST(self):
+            self._handle("POST")
+
+        def do_DELETE(self):
+            self._handle("DELETE")
+
+        # --- providers -------------------------------------------------------
+
+        def _owm(self, method: str, path: str, body: Dict) -> Tuple[int, Dict]:
+            query = dict(p.split("=", 1) for p in self.path.partition("?")[2].split("&") if "=" in p)
+            if path.endswith("/weather"):
+                return 200, _weather(int(query.get("id") or 6058560), query.get("q", "London").split(",")[0])
+            if path.endswith("/group"):
+                ids = [int(i) for i in query.get("id", "").replace("%2C", ",").split(",") if i]
+                return 200, {"cnt": len(ids), "list": [_weather(i, f"City {i}") for i in ids]}
+            if path.endswith("/onecall"):
+                return 200, _onecall()
+            return 404, {"message": "not found"}
+
+        def _openrouter(self, method: str, path: str, body: Dict) -> Tuple[int, Dict]:
+            if path.endswith("/chat/completions"):
+                return 200, {
+                    "id": state.new_id("gen"), "model": body.get("model"),
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": "Stub completion."}}],
+                    "usage": {"prompt_tokens": 10, "completion_tokens": 3, "total_tokens": 13},
+                }
+            return 404, {"error": "not found"}
+
+        def _openai(self, method: str, path: str, body: Dict) -> Tuple[int, Dict]:
+            now = int(time.time())
+            path = path[len("/v1"):] if path.startswith("/v1") else path
+            if path == "/assistants" and method == "POST":
+                return 200, {"id": state.new_id("asst"), "object": "assistant", "created_at": now,
+                             "model": body.get("model"), "tools": [], "name": body.get("name")}
+            if path == "/threads" and method == "POST":
+                thread_id = state.new_id("thread")
+                with state.lock:
+                    state.messages[thread_id] = []
+                return 200, {"id": thread_id, "object": "thread", "created_at": now, "metadata": {}}
+            match = re.fullmatch(r"/threads/([^/]+)/messages", path)
+            if match:
+                thread_id = match.group(1)
+                with state.lock:
+                    messages = state.messages.setdefault(thread_id, [])
+                    if method == "POST":
+                        message = {
+                            "id": state.new_id("msg"), "object": "thread.message", "created_at": now,
+                            "thread_id": thread_id, "role": body.get("role", "user"), "status": "completed",
+                            "content": [{"type": "text", "text": {"value": str(body.get("content")), "annotations": []}}],
+                            "attachments": [], "metadata": {},
+                        }
+                        messages.append(message)
+                        return 200, message
+                    query = dict(p.split("=", 1) for p in self.path.partition("?")[2].split("&") if "=" in p)
+                    newest_first = list(reversed(messages))
+                    ids = [m["id"] for m in newest_first]
+                    start = ids.index(query["after"]) + 1 if query.get("after") in ids else 0
+                    limit = int(query.get("limit", 20))
+                    return 200, {"object": "list", "data": newest_first[start:start + limit],
+                                 "has_more": start + limit < len(newest_first)}
+            match = re.fullmatch(r"/threads/([^/]+)/runs(?:/([^/]+))?(/submit_tool_outputs|/cancel)?", path)
+            if match:
+                thread_id, run_id, action = match.groups()
+                with state.lock:
+                    if run_id is None and method == "POST":
+                        run_id = state.new_id("run")
+                        state.runs[run_id] = {
+                            "id": run_id, "object": "thread.run", "created_at": now, "thread_id": thread_id,
+                            "assistant_id": body.get("assistant_id"), "status": "queued", "model": "gpt-4o",
+                            "instructions": body.get("instructions") or "", "tools": [], "_polls": 0,
+                        }
+                    run = state.runs.get(run_id)
+                    if run is None:
+                        return 404, {"error": {"message": "run not found"}}
+                    if action == "/submit_tool_outputs":
+                        run["status"] = "completed"
+                        run["required_action"] = None
+                    elif action == "/cancel":
+                        run["status"] = "cancelled"
+                    elif method == "GET" and run["status"] == "queued":
+                        # First poll asks for one weather tool call, exercising the dispatcher
+                        run["status"] = "requires_action"
+                        run["required_action"] = {"type": "submit_tool_outputs", "submit_tool_outputs": {"tool_calls": [{
+                            "id": state.new_id("call"), "type": "function",
+                            "function": {"name": "get_weather",
+                                         "arguments": json.dumps({"city": "London", "country_code": "CA"})},
+                        }]}}
+                    return 200, {k: v for k, v in run.items() if not k.startswith("_")}
+            if path == "/files" and method == "POST":
+                file_id = state.new_id("file")
+                with state.lock:
+                    state.files[file_id] = {"id": file_id, "object": "file", "bytes": 0, "created_at": now,
+                                            "filename": body.get("filename", "memory.txt"), "purpose": "assistants",
+                                            "status": "processed"}
+                return 200, state.files[file_id]
+            match = re.fullmatch(r"/vector_stores/([^/]+)/files/([^/]+)/content", path)
+            if match and method == "GET":
+                return 200, {"object": "vector_store.file_content.page", "has_more": False, "next_page": None,
+                             "data": [{"type": "text", "text": f"stub memory {match.group(2)}"}]}
+            match = re.fullmatch(r"/vector_stores/([^/]+)/files(?:/([^/]+))?", path)
+            if match:
+                vs_id, file_id = match.groups()
+                if method == "POST":
+                    return 200, {"id": body.get("file_id"), "object": "vector_store.file", "created_at": now,
+                                 "vector_store_id": vs_id, "status": "completed", "usage_bytes": 0,
+                                 "attributes": body.get("attributes") or {}}
+                if method == "DELETE":
+                    return 200, {"id": file_id, "object": "vector_store.file.deleted", "deleted": True}
+                with state.lock:
+                    files = [{"id": f["id"], "object": "vector_store.file", "created_at": f["created_at"],
+                              "vector_store_id": vs_id, "status": "completed", "usage_bytes": 0}
+                             for f in list(state.files.values())[-20:]]
+                return 200, {"object": "list", "data": files, "has_more": False}
+            if path == "/files" and method == "GET":
+                with state.lock:
+                    files = list(state.files.values())
+                return 200, {"object": "list", "data": files, "has_more": False}
+            match = re.fullmatch(r"/files/([^/]+)", path)
+            if match and method == "DELETE":
+                with state.lock:
+                    state.files.pop(match.group(1), None)
+                return 200, {"id": match.group(1), "object": "file", "deleted": True}
+            if path == "/responses" and method == "POST":
+                return 200, {
+                    "id": state.new_id("resp"), "object": "response", "created_at": now, "model": body.get("model"),
+                    "status": "completed", "parallel_tool_calls": True, "tool_choice": "auto", "tools": [],
+                    "output": [{"id": state.new_id("fs"), "type": "file_search_call", "status": "completed",
+                                "queries": [body.get("input")], "results": [
+                                    {"file_id": "file_1", "filename": "memory.txt", "score": 0.82,
+                                     "text": "The user's favorite color is purple.", "attributes": {"tag": "chat"}}]}],
+                }
+            return 404, {"error": {"message": f"stub has no route for {method} {path}"}}
+
+    return Handler
+
+
+def start_stub_server(port: int = 0, config: StubConfig = None) -> ThreadingHTTPServer:
+    """Start the stub server on a daemon thread; port 0 picks a free port."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(config or StubConfig(), _State()))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="upstream-stubs", daemon=True).start()
+    return server
+
+
+def add_stub_arguments(parser: argparse.ArgumentParser):
+    for provider in PROVIDERS:
+        parser.add_argument(f"--{provider}-latency", type=float, default=0.05, help=f"{provider} base latency (s)")
+        parser.add_argument(f"--{provider}-jitter", type=float, default=0.05, help=f"{provider} extra random latency (s)")
+        parser.add_argument(f"--{provider}-error-rate", type=float, default=0.0, help=f"{provider} fraction of 503s")
+
+
+def config_from_args(args) -> StubConfig:
+    return StubConfig(
+        latency={p: getattr(args, f"{p}_latency") for p in PROVIDERS},
+        jitter={p: getattr(args, f"{p}_jitter") for p in PROVIDERS},
+        error_rate={p: getattr(args, f"{p}_error_rate") for p in PROVIDERS},
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run local upstream stand-ins")
+    parser.add_argument("--port", type=int, default=8900)
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+    server = start_stub_server(args.port, config_from_args(args))
+    print(f"Stubs listening on http://127.0.0.1:{server.server_address[1]}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
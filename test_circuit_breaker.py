@@ -0,0 +1,147 @@
+import time
+import unittest
+from app import circuit_breaker
+from app.circuit_breaker import (
+    CircuitBreaker, CircuitOpen, GuardedTransport, get_breaker, record_failure, is_failure,
+    CLOSED, OPEN, HALF_OPEN,
+)
+from app.deadline import deadline_scope
+
+
+class HTTPError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class FakeRequest:
+    def __init__(self):
+        self.extensions = {"timeout": {"connect": 5.0, "read": 600.0, "write": 600.0, "pool": 600.0}}
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+class FakeTransport:
+    def __init__(self, result):
+        self.result = result
+        self.requests = []
+
+    def handle_request(self, request):
+        self.requests.append(request)
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def open_breaker(self):
+        breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=0.05)
+        breaker.record_failure()
+        breaker.record_failure()
+        return breaker
+
+    def test_opens_after_threshold_and_fails_fast(self):
+        breaker = self.open_breaker()
+        self.assertEqual(breaker.state, OPEN)
+        with self.assertRaises(CircuitOpen):
+            breaker.before_call()
+        self.assertEqual(breaker.stats()["rejected"], 1)
+
+    def test_success_resets_consecutive_failures(self):
+        breaker = CircuitBreaker("test", failure_threshold=2)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CLOSED)
+
+    def test_half_open_admits_a_single_probe(self):
+        breaker = self.open_breaker()
+        time.sleep(0.06)
+        breaker.before_call()
+        self.assertEqual(breaker.state, HALF_OPEN)
+        with self.assertRaises(CircuitOpen):
+            breaker.before_call()
+
+    def test_probe_success_closes(self):
+        breaker = self.open_breaker()
+        time.sleep(0.06)
+        breaker.before_call()
+        breaker.record_success()
+        self.assertEqual(breaker.state, CLOSED)
+        breaker.before_call()
+
+    def test_probe_failure_reopens(self):
+        breaker = self.open_breaker()
+        time.sleep(0.06)
+        breaker.before_call()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, OPEN)
+        with self.assertRaises(CircuitOpen):
+            breaker.before_call()
+
+    def test_released_probe_lets_the_next_call_through(self):
+        breaker = self.open_breaker()
+        time.sleep(0.06)
+        breaker.before_call()
+        breaker.release_probe()
+        breaker.before_call()
+        self.assertEqual(breaker.state, HALF_OPEN)
+
+    def test_client_errors_are_not_failures(self):
+        self.assertFalse(is_failure(HTTPError(404)))
+        self.assertTrue(is_failure(HTTPError(429)))
+        self.assertTrue(is_failure(HTTPError(503)))
+        self.assertTrue(is_failure(ConnectionError("refused")))
+
+
+class TestProviderBreakers(unittest.TestCase):
+    def setUp(self):
+        circuit_breaker._breakers["test"] = CircuitBreaker("test", failure_threshold=2, reset_timeout=0.05)
+        self.breaker = get_breaker("test")
+
+    def tearDown(self):
+        circuit_breaker._breakers.pop("test", None)
+
+    def test_probe_cut_short_by_deadline_is_released(self):
+        record_failure("test")
+        record_failure("test")
+        time.sleep(0.06)
+        with deadline_scope(0.01):
+            self.breaker.before_call()
+            time.sleep(0.02)
+            record_failure("test", TimeoutError("deadline"))
+        self.assertEqual(self.breaker.state, HALF_OPEN)
+        self.breaker.before_call()
+
+    def test_guarded_transport_caps_timeout_by_deadline(self):
+        inner = FakeTransport(FakeResponse(200))
+        with deadline_scope(0.5):
+            GuardedTransport("test", inner).handle_request(FakeRequest())
+        timeout = inner.requests[0].extensions["timeout"]
+        self.assertLessEqual(timeout["read"], 0.5)
+        self.assertEqual(self.breaker.state, CLOSED)
+
+    def test_guarded_transport_records_server_errors(self):
+        transport = GuardedTransport("test", FakeTransport(FakeResponse(502)))
+        transport.handle_request(FakeRequest())
+        transport.handle_request(FakeRequest())
+        self.assertEqual(self.breaker.state, OPEN)
+
+    def test_guarded_transport_releases_probe_when_deadline_is_spent(self):
+        record_failure("test")
+        record_failure("test")
+        time.sleep(0.06)
+        transport = GuardedTransport("test", FakeTransport(TimeoutError("read timeout")))
+        with deadline_scope(0.01):
+            self.breaker.before_call()
+            time.sleep(0.02)
+            with self.assertRaises(TimeoutError):
+                transport.handle_request(FakeRequest())
+        self.breaker.before_call()
+
+
+if __name__ == "__main__":
+    unittest.main()
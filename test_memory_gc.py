@@ -0,0 +1,123 @@
+import time
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from types import SimpleNamespace
+from app.memory_gc import collect_garbage, main
+
+OLD = time.time() - 7 * 86400
+
+
+def item(id, filename=None, created_at=OLD):
+    return SimpleNamespace(id=id, filename=filename, created_at=created_at, bytes=10)
+
+
+class Page:
+    def __init__(self, data):
+        self.data = data
+
+    def has_next_page(self):
+        return False
+
+
+class FakeFiles:
+    def __init__(self, files):
+        self.files = files
+        self.deleted = []
+
+    def list(self, **kwargs):
+        return Page(self.files)
+
+    def delete(self, file_id):
+        self.deleted.append(file_id)
+
+
+class FakeVectorStoreFiles:
+    def __init__(self, attached):
+        self.attached = attached
+        self.detached = []
+
+    def list(self, **kwargs):
+        return Page(self.attached)
+
+    def delete(self, vector_store_id, file_id):
+        self.detached.append(file_id)
+
+
+class FakeIndex:
+    def __init__(self, rows):
+        self.rows = rows
+        self.removed = []
+
+    def query(self, filters=None):
+        return self.rows
+
+    def remove(self, ids):
+        self.removed.extend(ids)
+
+
+def fake_store(files, attached, rows):
+    client = SimpleNamespace(files=FakeFiles(files), vector_stores=SimpleNamespace(files=FakeVectorStoreFiles(attached)))
+    return SimpleNamespace(client=client, vector_store_id="vs_test", index=FakeIndex(rows))
+
+
+class TestMemoryGC(unittest.TestCase):
+    def setUp(self):
+        # Keep the temp-file sweep away from the real temp directory
+        self.tmp = tempfile.mkdtemp(prefix="gc_test_")
+        patcher = mock.patch("app.memory_gc.tempfile.gettempdir", return_value=self.tmp)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(shutil.rmtree, self.tmp, True)
+        self.store = fake_store(
+            files=[
+                item("file-attached", "memir_a.txt"),
+                item("file-orphan", "memir_b.txt"),
+                item("file-indexed", "notes.txt"),
+                item("file-other-app", "report.pdf"),
+                item("file-legacy", "tmpk3j2x9ab.txt"),
+                item("file-fresh", "memir_c.txt", created_at=time.time()),
+            ],
+            attached=[item("file-attached"), item("file-gone")],
+            rows=[
+                {"id": "file-attached", "created_at": OLD},
+                {"id": "file-indexed", "created_at": OLD},
+            ],
+        )
+
+    def test_only_files_created_by_this_app_are_collected(self):
+        report = collect_garbage(self.store, dry_run=False)
+        self.assertEqual(sorted(self.store.client.files.deleted), ["file-indexed", "file-orphan"])
+        self.assertEqual(self.store.client.vector_stores.files.detached, ["file-gone"])
+        self.assertEqual(self.store.index.removed, ["file-indexed"])
+        self.assertEqual(report["orphan_files"]["count"], 2)
+
+    def test_dry_run_is_the_default(self):
+        report = collect_garbage(self.store)
+        self.assertTrue(report["dry_run"])
+        self.assertEqual(report["orphan_files"]["count"], 2)
+        self.assertEqual(self.store.client.files.deleted, [])
+        self.assertEqual(self.store.index.removed, [])
+
+    def test_legacy_uploads_are_only_collected_on_request(self):
+        collect_garbage(self.store, dry_run=False)
+        self.assertNotIn("file-legacy", self.store.client.files.deleted)
+        report = collect_garbage(self.store, dry_run=False, include_legacy=True)
+        self.assertIn("file-legacy", self.store.client.files.deleted)
+        self.assertEqual(report["orphan_files"]["count"], 3)
+
+    def test_cli_needs_explicit_delete_flag(self):
+        with mock.patch("app.memory_gc.collect_garbage", return_value={"failed": {}}) as collect, \
+                mock.patch("builtins.print"):
+            main([])
+            self.assertTrue(collect.call_args.kwargs["dry_run"])
+            main(["--delete"])
+            self.assertFalse(collect.call_args.kwargs["dry_run"])
+            self.assertFalse(collect.call_args.kwargs["include_legacy"])
+            main(["--include-legacy"])
+            self.assertTrue(collect.call_args.kwargs["include_legacy"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+import os
+import shutil
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+import httpx
+from openai import NotFoundError
+from app.memory import MemoryStore
+from app.memory_index import MemoryIndex
+
+
+class Page:
+    def __init__(self, data):
+        self.data = data
+
+    def has_next_page(self):
+        return False
+
+
+class FakeVectorStoreFiles:
+    """A vector store holding memories that were saved before the local index existed."""
+
+    def __init__(self, files):
+        self.files = files
+        self.content_calls = []
+        self.on_content = lambda file_id: None
+
+    def list(self, **kwargs):
+        return Page([SimpleNamespace(id=i, created_at=f["created_at"], attributes=f["attributes"])
+                     for i, f in self.files.items()])
+
+    def content(self, file_id, vector_store_id):
+        self.content_calls.append(file_id)
+        self.on_content(file_id)
+        return Page([SimpleNamespace(text=self.files[file_id]["text"])])
+
+
+class TestIndexSync(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(prefix="memir_sync_test_")
+        self.addCleanup(shutil.rmtree, self.dir, True)
+        self.files = FakeVectorStoreFiles({
+            "file-old": {"created_at": 1000, "attributes": None, "text": "legacy memory"},
+            "file-tagged": {"created_at": 2000, "attributes": {"tag": "work", "created_at": 2000}, "text": "standup at 9"},
+        })
+        self.store = MemoryStore(MemoryIndex(os.path.join(self.dir, "index.sqlite3")))
+        self.store.client = SimpleNamespace(vector_stores=SimpleNamespace(files=self.files))
+
+    def test_listing_backfills_memories_missing_from_the_index(self):
+        memories = self.store.list_memories()
+        self.assertEqual([(m["id"], m["document"], m["tag"]) for m in memories],
+                         [("file-tagged", "standup at 9", "work"), ("file-old", "legacy memory", None)])
+        self.assertEqual([m["id"] for m in self.store.list_memories({"tag": "work"})], ["file-tagged"])
+
+    def test_sync_runs_once_per_interval_and_fetches_only_new_files(self):
+        self.store.list_memories()
+        self.store.list_memories()
+        self.assertEqual(sorted(self.files.content_calls), ["file-old", "file-tagged"])
+        self.files.files["file-new"] = {"created_at": 3000, "attributes": {}, "text": "from another host"}
+        self.assertEqual(self.store.sync_index(max_age=0), {"seen": 3, "added": 1})
+        self.assertEqual(self.files.content_calls[-1], "file-new")
+
+    def test_sync_keeps_rows_indexed_while_it_ran(self):
+        # add_memory indexes the file between the sync's listing and its write
+        self.files.on_content = lambda file_id: self.store.index.add(file_id, "standup at 9", {"tag": "work", "importance": 0.9})
+        self.store.sync_index(max_age=0)
+        row = self.store.index.query({"tag": "work"})[0]
+        self.assertEqual((row["id"], row["importance"]), ("file-tagged", 0.9))
+
+
+class TestIndexQuery(unittest.TestCase):
+    def test_iter_query_streams_rows_across_threads(self):
+        directory = tempfile.mkdtemp(prefix="memir_index_test_")
+        self.addCleanup(shutil.rmtree, directory, True)
+        index = MemoryIndex(os.path.join(directory, "index.sqlite3"))
+        for i in range(1200):
+            index.add(f"m{i}", f"memory {i}", {"tag": "bulk"}, created_at=i + 1)
+        rows = index.iter_query({"tag": "bulk"})
+        self.assertEqual(next(rows)["id"], "m1199")
+        # StreamingResponse advances sync iterators from worker threads
+        with ThreadPoolExecutor(1) as pool:
+            rest = pool.submit(list, rows).result()
+        self.assertEqual(len(rest), 1199)
+        self.assertEqual(rest[-1]["id"], "m0")
+
+
+class FakeDeletes:
+    def __init__(self, existing):
+        self.existing = existing
+
+    def delete(self, file_id, vector_store_id=None):
+        if file_id not in self.existing:
+            response = httpx.Response(404, request=httpx.Request("DELETE", f"https://api.test/files/{file_id}"))
+            raise NotFoundError("No such file", response=response, body=None)
+
+
+class TestRemoveMemory(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp(prefix="memir_remove_test_")
+        self.addCleanup(shutil.rmtree, directory, True)
+        self.store = MemoryStore(MemoryIndex(os.path.join(directory, "index.sqlite3")))
+        deletes = FakeDeletes({"file-kept"})
+        self.store.client = SimpleNamespace(files=deletes, vector_stores=SimpleNamespace(files=deletes))
+
+    def test_unknown_id_is_reported_as_not_removed(self):
+        self.store.index.add("file-stale", "gone upstream", {})
+        self.assertTrue(self.store.remove_memory("file-kept"))
+        self.assertFalse(self.store.remove_memory("file-stale"))
+        self.assertEqual(self.store.index.missing(["file-stale"]), ["file-stale"])
+
+
+if __name__ == "__main__":
+    unittest.main()
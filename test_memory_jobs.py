@@ -0,0 +1,54 @@
+import os
+import time
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from app.deadline import deadline_scope, check
+from app.memory_jobs import start_job, get_job
+from app.shared_cache import SharedCache
+
+
+def slow_delete(ids):
+    time.sleep(0.1)
+    check()  # like admit() before every upstream call
+    return {"deleted": ids, "failed": {}}
+
+
+class TestMemoryJobs(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp(prefix="memir_jobs_test_")
+        self.addCleanup(shutil.rmtree, directory, True)
+        patcher = mock.patch("app.memory_jobs.get_cache", return_value=SharedCache(os.path.join(directory, "cache.sqlite3")))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def wait(self, job_id):
+        for _ in range(100):
+            job = get_job(job_id)
+            if job["status"] != "running":
+                return job
+            time.sleep(0.02)
+        self.fail("job did not finish")
+
+    def test_job_outlives_the_request_deadline(self):
+        with deadline_scope(0.05):
+            job = start_job("delete", slow_delete, ["file-1"])
+        self.assertEqual(job["status"], "running")
+        finished = self.wait(job["id"])
+        self.assertEqual(finished["status"], "done")
+        self.assertEqual(finished["report"], {"deleted": ["file-1"], "failed": {}})
+
+    def test_failure_is_recorded(self):
+        with mock.patch("builtins.print"):
+            job = start_job("gc", lambda: 1 / 0)
+            finished = self.wait(job["id"])
+        self.assertEqual(finished["status"], "failed")
+        self.assertIn("division", finished["error"])
+
+    def test_unknown_job(self):
+        self.assertIsNone(get_job("nope"))
+
+
+if __name__ == "__main__":
+    unittest.main()
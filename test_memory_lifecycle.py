@@ -0,0 +1,112 @@
+import os
+import time
+import tempfile
+import unittest
+from app.file_lock import file_lock
+from app.memory_lifecycle import MemoryCompactor
+from app.memory_index import MemoryIndex
+
+# Two topics under one tag: "coffee" memories point one way, "flight" memories the other
+VECTORS = {
+    "likes espresso": [1.0, 0.1, 0.0],
+    "drinks oat flat whites": [0.9, 0.2, 0.0],
+    "no coffee after 3pm": [1.0, 0.0, 0.1],
+    "flight to Lisbon on May 3": [0.0, 1.0, 0.1],
+    "aisle seat preferred": [0.1, 0.9, 0.0],
+}
+
+
+def memory(memory_id, document):
+    return {"id": memory_id, "document": document, "tag": "personal", "importance": 0.5}
+
+
+class FakeIndex:
+    def __init__(self, groups):
+        self.groups = groups
+        self.provenance = {}
+        self.path = ":memory:"
+
+    def consolidation_candidates(self, **kwargs):
+        return self.groups
+
+    def add_provenance(self, new_id, sources):
+        self.provenance[new_id] = [m["id"] for m in sources]
+
+
+class FakeStore:
+    def __init__(self, groups, fail_add=0):
+        self.index = FakeIndex(groups)
+        self.fail_add = fail_add
+        self.added = []
+        self.removed = []
+
+    def add_memory(self, text, metadata=None):
+        if self.fail_add:
+            self.fail_add -= 1
+            raise RuntimeError("upload failed")
+        self.added.append(text)
+        return {"id": f"new-{len(self.added)}"}
+
+    def remove_memory(self, memory_id):
+        self.removed.append(memory_id)
+
+
+class FakeLLM:
+    def complete(self, prompt, **kwargs):
+        return {"choices": [{"message": {"content": "merged"}}]}
+
+
+def compactor(store, **kwargs):
+    return MemoryCompactor(store, llm=FakeLLM(), min_cluster=2, min_similarity=0.8,
+                           embed=lambda texts: [VECTORS[text] for text in texts], **kwargs)
+
+
+class TestConsolidation(unittest.TestCase):
+    def setUp(self):
+        self.memories = [memory(f"m{i}", text) for i, text in enumerate(VECTORS)]
+
+    def test_clusters_split_unrelated_memories_within_a_tag(self):
+        clusters = compactor(FakeStore({}))._clusters(self.memories)
+        self.assertEqual([[m["id"] for m in c] for c in clusters], [["m0", "m1", "m2"], ["m3", "m4"]])
+
+    def test_cluster_size_is_capped(self):
+        clusters = compactor(FakeStore({}), max_cluster=2)._clusters(self.memories)
+        self.assertTrue(all(len(c) <= 2 for c in clusters))
+
+    def test_consolidate_merges_each_cluster_separately(self):
+        store = FakeStore({"personal": self.memories})
+        result = compactor(store)._consolidate(budget=50)
+        self.assertEqual(result, {"merged": 5, "created": 2, "failed": 0})
+        self.assertEqual(store.index.provenance, {"new-1": ["m0", "m1", "m2"], "new-2": ["m3", "m4"]})
+
+    def test_upload_failure_skips_cluster_and_continues(self):
+        store = FakeStore({"personal": self.memories}, fail_add=1)
+        result = compactor(store)._consolidate(budget=50)
+        self.assertEqual(result, {"merged": 2, "created": 1, "failed": 1})
+        self.assertEqual(store.removed, ["m3", "m4"])
+
+    def test_embedding_failure_is_reported(self):
+        store = FakeStore({"personal": self.memories})
+        broken = MemoryCompactor(store, llm=FakeLLM(), min_cluster=2, embed=lambda texts: 1 / 0)
+        self.assertEqual(broken._consolidate(budget=50), {"merged": 0, "created": 0, "failed": 1})
+
+    def test_run_skipped_while_another_process_holds_the_lock(self):
+        lock_path = os.path.join(tempfile.mkdtemp(prefix="memir_compact_test_"), "compact.lock")
+        store = FakeStore({"personal": self.memories})
+        with file_lock(lock_path):
+            report = compactor(store, lock_path=lock_path).run_once()
+        self.assertTrue(report["skipped"])
+        self.assertEqual(store.removed, [])
+
+    def test_memories_with_a_ttl_are_not_consolidated(self):
+        index = MemoryIndex(os.path.join(tempfile.mkdtemp(prefix="memir_index_test_"), "index.sqlite3"))
+        month_ago = time.time() - 30 * 86400
+        index.add("permanent", "likes espresso", {"tag": "personal", "created_at": month_ago})
+        index.add("temporary", "parked on level 2", {"tag": "personal", "created_at": month_ago,
+                                                      "expires_at": time.time() + 86400})
+        groups = index.consolidation_candidates(max_size=280, older_than=time.time(), max_importance=0.8)
+        self.assertEqual({tag: [m["id"] for m in rows] for tag, rows in groups.items()}, {"personal": ["permanent"]})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import time
+import threading
+import unittest
+from app.model_router import ModelRouter
+
+
+def answer(content, finish_reason="stop"):
+    return {"choices": [{"message": {"content": content}, "finish_reason": finish_reason}]}
+
+
+class FakeClient:
+    """Stands in for OpenRouterClient: per-model canned answers, exceptions or delays."""
+
+    def __init__(self, behaviour):
+        self.behaviour = behaviour
+        self.calls = []
+
+    def complete(self, prompt, model=None, **kwargs):
+        self.calls.append(model)
+        result = self.behaviour[model]
+        if isinstance(result, tuple):
+            delay, result = result
+            time.sleep(delay)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+class TestModelRouter(unittest.TestCase):
+    def router(self, behaviour, **kwargs):
+        kwargs.setdefault("hedge", False)
+        return ModelRouter(FakeClient(behaviour), primary="a", fallbacks=["b"], cascade_models=["a", "b"], **kwargs)
+
+    def test_failover_on_error(self):
+        router = self.router({"a": RuntimeError("down"), "b": answer("from b")})
+        self.assertEqual(router.complete("hi"), answer("from b"))
+        self.assertEqual(router.stats()["recent_decisions"][-1]["winner"], "b")
+
+    def test_hedge_to_fallback_when_primary_is_slow(self):
+        router = self.router({"a": (0.5, answer("slow")), "b": answer("fast")}, hedge=True, hedge_delay=0.05)
+        self.assertEqual(router.complete("hi"), answer("fast"))
+        decision = router.stats()["recent_decisions"][-1]
+        self.assertEqual((decision["hedged_to"], decision["winner"]), ("b", "b"))
+
+    def test_time_queued_in_the_pool_does_not_trigger_a_hedge(self):
+        router = self.router({"a": (0.08, answer("a")), "b": answer("b")}, hedge=True, hedge_delay=0.1, max_workers=1)
+        results = []
+        callers = [threading.Thread(target=lambda: results.append(router.complete("hi"))) for _ in range(2)]
+        for caller in callers:
+            caller.start()
+        for caller in callers:
+            caller.join(5)
+        self.assertEqual(results, [answer("a")] * 2)
+        self.assertEqual(router.stats()["counters"]["hedged"], 0)
+
+    def test_all_models_fail(self):
+        router = self.router({"a": RuntimeError("down"), "b": RuntimeError("down")})
+        with self.assertRaises(RuntimeError):
+            router.complete("hi")
+
+    def test_cascade_escalates_past_rejected_answer(self):
+        router = self.router({"a": answer("", "length"), "b": answer("good")})
+        self.assertEqual(router.cascade("plan"), answer("good"))
+        decision = router.stats()["recent_decisions"][-1]
+        self.assertEqual((decision["winner"], decision["accepted"]), ("b", True))
+
+    def test_cascade_reports_rejected_answer_from_model_that_produced_it(self):
+        rejected = answer("cut off", "length")
+        router = self.router({"a": rejected, "b": RuntimeError("down")})
+        self.assertEqual(router.cascade("plan"), rejected)
+        decision = router.stats()["recent_decisions"][-1]
+        self.assertEqual((decision["winner"], decision["accepted"]), ("a", False))
+        self.assertEqual(router.stats()["counters"]["cascade_unaccepted"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
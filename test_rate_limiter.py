@@ -0,0 +1,55 @@
+import time
+import threading
+import unittest
+from app.rate_limiter import RateLimiter, TokenBucket, RateLimitTimeout, priority, INTERACTIVE, BACKGROUND
+
+
+class TestRateLimiter(unittest.TestCase):
+    def test_burst_then_throttle(self):
+        limiter = RateLimiter("test", [TokenBucket(rate=20.0, capacity=2.0)])
+        self.assertLess(limiter.acquire(), 0.01)
+        self.assertLess(limiter.acquire(), 0.01)
+        waited = limiter.acquire()
+        self.assertGreater(waited, 0.02)
+
+    def test_timeout(self):
+        limiter = RateLimiter("test", [TokenBucket(rate=0.1, capacity=1.0)])
+        limiter.acquire()
+        with self.assertRaises(RateLimitTimeout):
+            limiter.acquire(timeout=0.05)
+        self.assertEqual(limiter.stats()["timeouts"], 1)
+        self.assertEqual(limiter.stats()["queue_depth"], 0)
+
+    def test_interactive_served_before_background(self):
+        limiter = RateLimiter("test", [TokenBucket(rate=20.0, capacity=1.0)])
+        limiter.acquire()
+        order = []
+
+        def worker(level, name):
+            limiter.acquire(level=level)
+            order.append(name)
+
+        background = threading.Thread(target=worker, args=(BACKGROUND, "background"))
+        background.start()
+        time.sleep(0.01)
+        interactive = threading.Thread(target=worker, args=(INTERACTIVE, "interactive"))
+        interactive.start()
+        background.join(2)
+        interactive.join(2)
+        self.assertEqual(order, ["interactive", "background"])
+
+    def test_background_reserve_larger_than_burst_does_not_starve(self):
+        limiter = RateLimiter("test", [TokenBucket(rate=50.0, capacity=1.0)], background_reserve=5.0)
+        with priority(BACKGROUND):
+            limiter.acquire(timeout=1.0)
+
+    def test_daily_bucket_caps_requests(self):
+        limiter = RateLimiter("test", [TokenBucket(rate=100.0, capacity=10.0), TokenBucket(rate=1 / 86400.0, capacity=2.0)])
+        limiter.acquire()
+        limiter.acquire()
+        with self.assertRaises(RateLimitTimeout):
+            limiter.acquire(timeout=0.05)
+
+
+if __name__ == "__main__":
+    unittest.main()
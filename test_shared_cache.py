@@ -0,0 +1,69 @@
+import os
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+import multiprocessing
+from app.shared_cache import SharedCache
+
+
+def store_in_child(path):
+    SharedCache(path).set("weather", "london", {"temp": 12}, ttl=60)
+
+
+class TestSharedCache(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(prefix="memir_cache_test_")
+        self.path = os.path.join(self.dir, "cache.sqlite3")
+        self.cache = SharedCache(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def test_set_get_and_expiry(self):
+        self.cache.set("weather", "london", {"temp": 12}, ttl=0.05)
+        self.assertEqual(self.cache.get("weather", "london"), {"temp": 12})
+        time.sleep(0.06)
+        self.assertIsNone(self.cache.get("weather", "london"))
+
+    def test_bump_invalidates_only_its_namespace(self):
+        self.cache.set("memory_search", "q", ["hit"], ttl=60)
+        self.cache.set("weather", "q", "sunny", ttl=60)
+        self.cache.bump("memory_search")
+        self.assertIsNone(self.cache.get("memory_search", "q"))
+        self.assertEqual(self.cache.get("weather", "q"), "sunny")
+
+    def test_concurrent_misses_compute_once(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.05)
+            return "value"
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.cache.get_or_compute("llm", "k", 60, compute)))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(results, ["value"] * 8)
+        self.assertEqual(len(calls), 1)
+
+    def test_none_results_are_not_cached(self):
+        calls = []
+        for _ in range(2):
+            self.cache.get_or_compute("weather", "nowhere", 60, lambda: calls.append(1))
+        self.assertEqual(len(calls), 2)
+
+    def test_entries_are_shared_across_processes(self):
+        child = multiprocessing.Process(target=store_in_child, args=(self.path,))
+        child.start()
+        child.join(10)
+        self.assertEqual(self.cache.get("weather", "london"), {"temp": 12})
+
+
+if __name__ == "__main__":
+    unittest.main()
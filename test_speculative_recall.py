@@ -0,0 +1,58 @@
+import time
+import unittest
+from app.speculative_recall import SpeculativeRecall
+from app.deadline import deadline_scope, check, DeadlineExceeded
+from app.rate_limiter import current_priority, BACKGROUND, INTERACTIVE
+
+
+class SlowStore:
+    def __init__(self, delay):
+        self.delay = delay
+        self.queries = []
+        self.priorities = []
+
+    def search_memories(self, query):
+        check()  # like admit() in front of the real search
+        self.queries.append(query)
+        self.priorities.append(current_priority())
+        time.sleep(self.delay)
+        check()
+        return [{"document": f"about {query}", "score": 0.9}]
+
+
+class TestSpeculativeRecall(unittest.TestCase):
+    def test_matching_query_uses_prefetch(self):
+        store = SlowStore(0.0)
+        recall = SpeculativeRecall(store)
+        recall.start("what is my dog's name")
+        self.assertEqual(recall.search("dog name"), [{"document": "about what is my dog's name", "score": 0.9}])
+        self.assertEqual(recall.stats()["hits"], 1)
+        self.assertEqual(len(store.queries), 1)
+
+    def test_prefetch_runs_at_background_priority(self):
+        store = SlowStore(0.0)
+        recall = SpeculativeRecall(store)
+        recall.start("what is my dog's name")
+        recall.search("where do I work")
+        self.assertEqual(store.priorities, [BACKGROUND, INTERACTIVE])
+
+    def test_waiting_on_prefetch_is_bounded_by_deadline(self):
+        recall = SpeculativeRecall(SlowStore(1.0))
+        started = time.monotonic()
+        with self.assertRaises(DeadlineExceeded):
+            with deadline_scope(0.1):
+                recall.start("what is my dog's name")
+                recall.search("dog name")
+        self.assertLess(time.monotonic() - started, 0.5)
+
+    def test_injectable_wait_is_bounded_by_deadline(self):
+        recall = SpeculativeRecall(SlowStore(1.0), inject_score=0.5, inject_wait=5.0)
+        started = time.monotonic()
+        with deadline_scope(0.1):
+            recall.start("what is my dog's name")
+            self.assertEqual(recall.injectable(), [])
+        self.assertLess(time.monotonic() - started, 0.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
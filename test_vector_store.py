@@ -0,0 +1,125 @@
+import os
+import shutil
+import tempfile
+import unittest
+import multiprocessing
+import numpy as np
+from app.vector_store import LocalVectorStore
+
+DIM = 8
+
+
+def vec(seed):
+    return np.random.default_rng(seed).normal(size=DIM).astype(np.float32)
+
+
+def seed_for(prefix, i):
+    return int(prefix[1:]) * 1000 + i
+
+
+def append_many(path, prefix, count):
+    store = LocalVectorStore(path, dim=DIM, dtype="int8")
+    for i in range(count):
+        store.add(f"{prefix}-{i}", vec(seed_for(prefix, i)))
+
+
+class TestLocalVectorStore(unittest.TestCase):
+    def setUp(self):
+        self.path = tempfile.mkdtemp(prefix="memir_vs_test_")
+
+    def tearDown(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def test_search_update_delete_for_each_dtype(self):
+        for dtype in ("float16", "int8"):
+            path = os.path.join(self.path, dtype)
+            store = LocalVectorStore(path, dim=DIM, dtype=dtype)
+            store.add_many(["a", "b", "c"], [vec(1), vec(2), vec(3)])
+            self.assertEqual(store.search(vec(2), k=1)[0][0], "b")
+            store.add("b", vec(4))
+            self.assertEqual(store.search(vec(4), k=1)[0][0], "b")
+            self.assertTrue(store.delete("a"))
+            self.assertFalse(store.delete("a"))
+            self.assertEqual(len(store), 2)
+            self.assertNotIn("a", [item for item, _ in store.search(vec(1), k=3)])
+            self.assertEqual(store.search(vec(3), k=3, allowed=["c"]), store.search(vec(3), k=1))
+
+    def test_compact_and_reopen(self):
+        store = LocalVectorStore(self.path, dim=DIM, dtype="int8")
+        store.add_many([f"m{i}" for i in range(10)], [vec(i) for i in range(10)])
+        for i in range(5):
+            store.delete(f"m{i}")
+        self.assertEqual(store.compact(), {"rows_before": 10, "rows_after": 5})
+        reopened = LocalVectorStore(self.path, dim=DIM, dtype="int8")
+        self.assertEqual(len(reopened), 5)
+        self.assertEqual(reopened.search(vec(7), k=1)[0][0], "m7")
+
+    def test_reopen_after_partial_int8_write(self):
+        store = LocalVectorStore(self.path, dim=DIM, dtype="int8")
+        store.add_many(["a", "b"], [vec(1), vec(2)])
+        # Crash between the vectors append and the scales/log appends
+        with open(store._file("vectors"), "ab") as f:
+            f.write(b"\x01" * DIM)
+        with open(store._file("ids"), "a") as f:
+            f.write('{"op": "add", "id": "c", "ro')
+        reopened = LocalVectorStore(self.path, dim=DIM, dtype="int8")
+        self.assertEqual(reopened.rows, 2)
+        self.assertEqual(reopened.search(vec(2), k=1)[0][0], "b")
+        reopened.add("d", vec(5))
+        again = LocalVectorStore(self.path, dim=DIM, dtype="int8")
+        self.assertEqual(sorted(again._index), ["a", "b", "d"])
+        self.assertEqual(again.search(vec(5), k=1)[0][0], "d")
+
+    def test_reopen_after_partial_row(self):
+        store = LocalVectorStore(self.path, dim=DIM, dtype="float16")
+        store.add("a", vec(1))
+        with open(store._file("vectors"), "ab") as f:
+            f.write(b"\x00" * 3)
+        reopened = LocalVectorStore(self.path, dim=DIM, dtype="float16")
+        reopened.add("b", vec(2))
+        self.assertEqual(LocalVectorStore(self.path, dim=DIM, dtype="float16").search(vec(2), k=1)[0][0], "b")
+
+    def test_open_store_recovers_from_another_writers_crash(self):
+        e_x, e_y = np.eye(DIM, dtype=np.float32)[:2]
+        store = LocalVectorStore(self.path, dim=DIM, dtype="float16")
+        store.add("a", e_x)
+        # Another process crashed after writing part of a row
+        with open(store._file("vectors"), "ab") as f:
+            f.write(b"\x00" * 3)
+        with open(store._file("ids"), "a") as f:
+            f.write('{"op": "add", "id": "z", "ro')
+        store.add("b", e_y)
+        hit, score = store.search(e_y, k=1)[0]
+        self.assertEqual(hit, "b")
+        self.assertAlmostEqual(score, 1.0, places=2)
+        reopened = LocalVectorStore(self.path, dim=DIM, dtype="float16")
+        self.assertEqual(sorted(reopened._index), ["a", "b"])
+        self.assertAlmostEqual(reopened.search(e_y, k=1)[0][1], 1.0, places=2)
+
+    def test_concurrent_appends_from_two_processes(self):
+        LocalVectorStore(self.path, dim=DIM, dtype="int8")
+        workers = [multiprocessing.Process(target=append_many, args=(self.path, name, 40)) for name in ("p1", "p2")]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(30)
+        store = LocalVectorStore(self.path, dim=DIM, dtype="int8")
+        self.assertEqual(len(store), 80)
+        self.assertEqual(store.rows, 80)
+        for name in ("p1", "p2"):
+            self.assertEqual(store.search(vec(seed_for(name, 7)), k=1)[0][0], f"{name}-7")
+
+    def test_reader_sees_appends_from_another_instance(self):
+        reader = LocalVectorStore(self.path, dim=DIM, dtype="float16")
+        writer = LocalVectorStore(self.path, dim=DIM, dtype="float16")
+        writer.add("x", vec(9))
+        self.assertEqual(reader.search(vec(9), k=1)[0][0], "x")
+
+    def test_rejects_mismatched_dim(self):
+        LocalVectorStore(self.path, dim=DIM)
+        with self.assertRaises(ValueError):
+            LocalVectorStore(self.path, dim=DIM * 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+from unittest import mock
+import requests
+from app import weather
+from app.tool_dispatcher import handle_get_weather_batch
+
+KEY = "SECRET-OWM-KEY"
+
+
+def not_found(url, params=None, timeout=None):
+    response = requests.Response()
+    response.status_code = 404
+    response.reason = "Not Found"
+    response.url = requests.Request("GET", url, params=params).prepare().url
+    return response
+
+
+class TestWeatherBatchErrors(unittest.TestCase):
+    def setUp(self):
+        for patcher in (mock.patch.object(weather, "OPENWEATHERMAP_API_KEY", KEY),
+                        mock.patch.object(weather.requests, "get", side_effect=not_found),
+                        mock.patch("builtins.print")):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_not_found_reason_does_not_leak_the_api_key(self):
+        batch = weather.get_weather_batch(["NoSuchCity,XX"])
+        self.assertEqual(batch["errors"], {"NoSuchCity,XX": "Not found"})
+        self.assertNotIn(KEY, repr(batch))
+
+    def test_tool_output_does_not_leak_the_api_key(self):
+        output = handle_get_weather_batch({"locations": ["NoSuchCity,XX"]})
+        self.assertIn("NoSuchCity,XX: unavailable (Not found)", output)
+        self.assertNotIn(KEY, output)
+
+    def test_server_log_is_redacted(self):
+        weather.get_weather_batch(["NoSuchCity,XX"])
+        logged = " ".join(str(call) for call in print.call_args_list)
+        self.assertIn("appid=***", logged)
+        self.assertNotIn(KEY, logged)
+
+
+if __name__ == "__main__":
+    unittest.main()